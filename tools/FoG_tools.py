@@ -0,0 +1,576 @@
+"""Agent tools that wrap external programs.
+
+These tools give the LLM agent access to the surrounding system: running JS
+testcases under d8, lifting/compiling FuzzIL programs with FuzzILTool,
+searching the source trees with ripgrep, and a few small utilities (tree,
+realpath, a DuckDuckGo lookup, ad-hoc Python snippets).
+"""
+
+import asyncio
+import atexit
+import base64
+import concurrent.futures
+import contextlib
+import functools
+import hashlib
+import io
+import multiprocessing
+import os
+import shlex
+import sqlite3
+import subprocess
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import httpx
+import orjson
+from langchain_core.tools import tool
+
+from tools.common_tools import (FUZZILLI_PATH, OUTPUT_DIRECTORY, V8_PATH,
+                                get_output, run_command, run_command_bytes)
+
+D8_PATH = os.getenv('D8_PATH') or os.path.join(V8_PATH, 'out', 'fuzzbuild', 'd8')
+FUZZILTOOL_PATH = os.path.join(FUZZILLI_PATH, '.build', 'release', 'FuzzILTool')
+SWIFT_PATH = os.getenv('SWIFT_PATH') or os.path.join(FUZZILLI_PATH, 'Sources')
+
+# Created once here so the d8 record path does not re-stat the directory on
+# every run.
+os.makedirs(OUTPUT_DIRECTORY, exist_ok=True)
+
+
+# Lookup answers are cached twice over: an in-process LRU for repeats within
+# a session, and an on-disk SQLite table (24h TTL) for repeats across
+# sessions. A cache hit costs a dict lookup instead of a network round-trip.
+# The connection is shared across threads (alookup runs via asyncio.to_thread),
+# so it is opened with check_same_thread=False and used under _LOOKUP_LOCK,
+# like the RAG connection in common_tools.
+_LOOKUP_CACHE_DIR = os.path.expanduser(os.path.join('~', '.cache', 'fog'))
+_LOOKUP_TTL = 24 * 60 * 60
+_LOOKUP_CONN = None
+_LOOKUP_LOCK = threading.Lock()
+
+# One warm client for the whole session: the TCP+TLS connection to the API is
+# kept alive and HTTP/2 lets concurrent lookups multiplex over it.
+_HTTP = httpx.Client(http2=True, timeout=10)
+atexit.register(_HTTP.close)
+
+
+def _lookup_conn():
+    global _LOOKUP_CONN
+    if _LOOKUP_CONN is None:
+        os.makedirs(_LOOKUP_CACHE_DIR, exist_ok=True)
+        _LOOKUP_CONN = sqlite3.connect(
+            os.path.join(_LOOKUP_CACHE_DIR, 'lookup.sqlite'),
+            check_same_thread=False)
+        _LOOKUP_CONN.execute('PRAGMA journal_mode=WAL')
+        _LOOKUP_CONN.execute('CREATE TABLE IF NOT EXISTS lookup '
+                             '(qhash TEXT PRIMARY KEY, ts INTEGER, body TEXT)')
+    return _LOOKUP_CONN
+
+
+def _lookup_fetch(query):
+    try:
+        return _HTTP.get('https://api.duckduckgo.com/',
+                         params={'q': query, 'format': 'json', 'no_html': '1',
+                                 'skip_disambig': '1'}).text
+    except httpx.HTTPError:
+        return ''
+
+
+@functools.lru_cache(maxsize=1024)
+def _lookup_cached(query):
+    qhash = hashlib.sha256(query.encode()).hexdigest()
+    with _LOOKUP_LOCK:
+        conn = _lookup_conn()
+        row = conn.execute('SELECT ts, body FROM lookup WHERE qhash = ?',
+                           (qhash,)).fetchone()
+    if row is not None and time.time() - row[0] < _LOOKUP_TTL:
+        return row[1]
+    body = _lookup_fetch(query)
+    if body:
+        with _LOOKUP_LOCK:
+            conn.execute('INSERT OR REPLACE INTO lookup VALUES (?, ?, ?)',
+                         (qhash, int(time.time()), body))
+            conn.commit()
+    return body
+
+
+@tool
+def lookup(query: str) -> str:
+    """Look up a query on DuckDuckGo and return the raw JSON answer."""
+    # Normalize before caching so trivially different phrasings share a slot.
+    return _lookup_cached(' '.join(query.lower().split()))
+
+
+# Snippets run in a pre-forked worker pool: each call pickles the code string
+# to a warm interpreter instead of paying fork+exec and interpreter startup.
+_PY_POOL = None
+
+
+def _exec_snippet(code):
+    out = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            exec(compile(code, '<agent>', 'exec'), {'__name__': '__agent__'})
+    except BaseException as e:
+        out.write(f'{type(e).__name__}: {e}')
+    return out.getvalue()
+
+
+def _py_pool():
+    global _PY_POOL
+    if _PY_POOL is None:
+        _PY_POOL = concurrent.futures.ProcessPoolExecutor(
+            max_workers=4, mp_context=multiprocessing.get_context('fork'))
+    return _PY_POOL
+
+
+@tool
+def run_python(code: str) -> str:
+    """Run a Python snippet and return its output."""
+    future = _py_pool().submit(_exec_snippet, code)
+    try:
+        return future.result(timeout=30)
+    except concurrent.futures.TimeoutError:
+        # The worker is wedged on the snippet; kill the pool so the stuck
+        # process cannot absorb later submissions, and rebuild lazily.
+        global _PY_POOL
+        for proc in _PY_POOL._processes.values():
+            proc.kill()
+        _PY_POOL.shutdown(wait=False, cancel_futures=True)
+        _PY_POOL = None
+        return 'Timed out after 30s'
+
+
+def _render_tree(root, max_depth):
+    lines = [root]
+
+    def walk(dir_path, prefix, depth):
+        try:
+            entries = sorted(os.scandir(dir_path), key=lambda e: e.name)
+        except OSError:
+            return
+        entries = [e for e in entries if not e.name.startswith('.')]
+        for i, entry in enumerate(entries):
+            last = i == len(entries) - 1
+            lines.append(prefix + ('└── ' if last else '├── ') + entry.name)
+            # is_dir() on a scandir entry uses the dirent type, so the walk
+            # does not stat every file the way tree(1) does.
+            if entry.is_dir(follow_symlinks=False) and depth < max_depth:
+                walk(entry.path, prefix + ('    ' if last else '│   '), depth + 1)
+
+    walk(root, '', 1)
+    return '\n'.join(lines)
+
+
+# Rendered trees keyed by (root, depth, root mtime). The root mtime only
+# moves when direct children change, so a deep-only modification can serve a
+# stale render — fine for the orientation queries this tool answers.
+_TREE_CACHE = {}
+
+
+@tool
+def tree(directory: str, options: str = '') -> str:
+    """Show the directory tree of the given directory. Options are passed to tree(1), e.g. "-L 2"."""
+    # Render the common cases in-process; only exotic option combinations
+    # still fork the tree binary.
+    tokens = options.split()
+    max_depth = 3
+    unknown = []
+    i = 0
+    while i < len(tokens):
+        if tokens[i] == '-L' and i + 1 < len(tokens) and tokens[i + 1].isdigit():
+            max_depth = int(tokens[i + 1])
+            i += 2
+        else:
+            unknown.append(tokens[i])
+            i += 1
+    if unknown:
+        return get_output(run_command(['tree', *shlex.split(options), directory]))
+    key = (directory, max_depth, _file_stamp(directory))
+    rendered = _TREE_CACHE.get(key)
+    if rendered is None:
+        rendered = _TREE_CACHE[key] = _render_tree(directory, max_depth)
+    return rendered
+
+
+@tool
+def get_realpath(path: str) -> str:
+    """Resolve a path to its canonical absolute form."""
+    return str(Path(path).resolve())
+
+
+# Session-wide ripgrep defaults, applied through RIPGREP_CONFIG_PATH so
+# every rg invocation picks them up without per-call flags: the build
+# artifact and size excludes from before, plus type definitions that let
+# callers write -tswift / -tfuzzil. Command-line flags still win over the
+# config, so callers can override any of it; an externally-set
+# RIPGREP_CONFIG_PATH is respected as-is.
+_RG_CONFIG_PATH = '/tmp/fog-rg.conf'
+_RG_CONFIG = ('--type-add=swift:*.swift',
+              '--type-add=fuzzil:*.{fzil,fuzzil}',
+              '--smart-case',
+              '--glob=!.build/**',
+              '--glob=!out/**',
+              '--glob=!*.pb',
+              '--max-filesize=4M',
+              '--max-columns=512')
+
+if 'RIPGREP_CONFIG_PATH' not in os.environ:
+    with open(_RG_CONFIG_PATH, 'w') as _f:
+        _f.write('\n'.join(_RG_CONFIG) + '\n')
+    os.environ['RIPGREP_CONFIG_PATH'] = _RG_CONFIG_PATH
+
+
+def _rg_argv(pattern, options):
+    opts = shlex.split(options)
+    # Most agent queries are plain identifiers. Passing those with -F keeps
+    # ripgrep on its SIMD literal scan instead of the regex engine.
+    if (not any(c in pattern for c in r'.*+?|()[]{}^$\\')
+            and '-F' not in opts and '--fixed-strings' not in opts):
+        opts.insert(0, '-F')
+    return ['rg', '--json', '--no-messages', f'--threads={os.cpu_count()}',
+            *opts, '--', pattern, FUZZILLI_PATH, V8_PATH]
+
+
+def _rg_text(obj):
+    # rg's JSON schema replaces "text" with base64 "bytes" when a path or
+    # line is not valid UTF-8 (plenty of V8 test/third_party files are not).
+    text = obj.get('text')
+    if text is None:
+        text = base64.b64decode(obj['bytes']).decode('utf-8', 'replace')
+    return text
+
+
+def _rg_collect(lines):
+    results = []
+    for line in lines:
+        event = orjson.loads(line)
+        if event['type'] != 'match':
+            continue
+        data = event['data']
+        results.append(f"{_rg_text(data['path'])}:{data['line_number']}: "
+                       f"{_rg_text(data['lines']).rstrip()}")
+    if not results:
+        return 'No results found'
+    return '\n'.join(results)
+
+
+@tool
+def ripgrep(pattern: str, options: str = '') -> str:
+    """Search the fuzzilli and V8 source trees with ripgrep."""
+    # --json gives one event per line, so matches are decoded structurally
+    # instead of scraping rg's human-readable output, and the argv list keeps
+    # patterns with quotes or semicolons intact (no shell in between).
+    try:
+        proc = subprocess.Popen(_rg_argv(pattern, options),
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL)
+    except OSError as e:
+        return f'command failed: {e}'
+    result = _rg_collect(proc.stdout)
+    proc.wait()
+    return result
+
+
+@tool
+def fuzzy_finder(pattern: str) -> str:
+    """Fuzzy-match file names in the fuzzilli and V8 source trees."""
+    # Two processes wired fd-to-fd; the pattern goes to fzf as a plain
+    # argument, so quotes in it cannot break anything.
+    find = subprocess.Popen(
+        ['find', FUZZILLI_PATH, V8_PATH, '-name', '.build', '-prune',
+         '-o', '-name', 'out', '-prune', '-o', '-type', 'f', '-print'],
+        stdout=subprocess.PIPE)
+    try:
+        fzf = subprocess.run(['fzf', '--filter', pattern], stdin=find.stdout,
+                             capture_output=True, text=True, timeout=60)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        return f'command failed: {e}'
+    finally:
+        find.stdout.close()
+        find.wait()
+    return get_output(fzf)
+
+
+def _file_stamp(path):
+    """Cache key component for a target file: changes whenever the file does."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+# On-disk layer under the in-memory lru_cache: keyed by content hash, so a
+# program the agent re-lifts across sessions (or from a copied path) skips
+# FuzzILTool's Swift runtime startup entirely.
+_FZIL_CACHE_DIR = '/tmp/fog-fzil-cache'
+
+
+def _content_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=512)
+def _fuzziltool_cached(option, target, stamp):
+    try:
+        digest = _content_hash(target)
+    except OSError:
+        digest = None
+    if digest is not None:
+        cache_path = os.path.join(_FZIL_CACHE_DIR, f"{digest}.{option.lstrip('-')}")
+        try:
+            with open(cache_path) as f:
+                return f.read()
+        except OSError:
+            pass
+    output = get_output(run_command([FUZZILTOOL_PATH, option, target]))
+    if digest is not None:
+        os.makedirs(_FZIL_CACHE_DIR, exist_ok=True)
+        tmp = f'{cache_path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(output)
+        # Atomic publish: concurrent sessions never observe a partial entry.
+        os.replace(tmp, cache_path)
+    return output
+
+
+@tool
+def lift_fuzzil_to_js(target: str) -> str:
+    """Lift a FuzzIL protobuf program (.fzil file) to JavaScript."""
+    return _fuzziltool_cached('--liftToJS', target, _file_stamp(target))
+
+
+@tool
+def compile_js_to_fuzzil(target: str) -> str:
+    """Compile a JavaScript file to a FuzzIL program via the Fuzzilli compiler."""
+    return _fuzziltool_cached('--compile', target, _file_stamp(target))
+
+
+# Long-lived d8 workers in REPL mode, one per flag combination, so V8
+# startup (snapshot load, heap setup) is paid once per session per flag set
+# instead of once per testcase. The pool is capped; flag combinations beyond
+# the cap fall back to a fresh fork per run. _D8_LOCK guards only the pool
+# dict; each worker carries its own lock for the write/read transaction, so
+# a slow run never blocks runs on other flag combinations.
+_D8_WORKERS = {}  # flags -> (process, transaction lock)
+_D8_LOCK = threading.Lock()
+_D8_POOL_LIMIT = 4
+_D8_REPL_TIMEOUT = 60
+
+
+def _get_d8_worker(flags):
+    entry = _D8_WORKERS.get(flags)
+    if entry is None or entry[0].poll() is not None:
+        proc = subprocess.Popen([D8_PATH, *flags, '--interactive'],
+                                stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT,
+                                text=True, bufsize=1)
+        entry = _D8_WORKERS[flags] = (proc, threading.Lock())
+    return entry
+
+
+def _evict_d8_worker(flags, worker):
+    worker.kill()
+    with _D8_LOCK:
+        entry = _D8_WORKERS.get(flags)
+        if entry is not None and entry[0] is worker:
+            del _D8_WORKERS[flags]
+
+
+def _run_d8_on_worker(target, flags=()):
+    sentinel = f'__FOG_DONE_{uuid.uuid4().hex}__'
+    try:
+        source = Path(target).read_text()
+    except (OSError, UnicodeDecodeError):
+        # Unreadable testcase: fall back so the fresh fork reports the
+        # real error.
+        return None
+    with _D8_LOCK:
+        if flags not in _D8_WORKERS and len(_D8_WORKERS) >= _D8_POOL_LIMIT:
+            return None
+        worker, worker_lock = _get_d8_worker(flags)
+    # JSON string escaping is valid JS string escaping, so the testcase
+    # source survives as one literal on one REPL line. Each run evaluates
+    # in a fresh realm: successive testcases on a warm worker would
+    # otherwise share the REPL's global scope, and fuzzilli-lifted programs
+    # all declare the same top-level lets, so the second one would die with
+    # a redeclaration SyntaxError. The IIFE keeps the realm handle itself
+    # out of that shared scope.
+    js_source = orjson.dumps(source).decode()
+    # The catch guarantees the sentinel prints even when the testcase
+    # throws: d8 abandons the rest of an input line on an uncaught
+    # exception, which would otherwise leave the read loop waiting forever.
+    command = ('(function () { var realm = Realm.createAllowCrossRealmAccess(); '
+               f'try {{ Realm.eval(realm, {js_source}); }} '
+               'catch (e) { print(e); } Realm.dispose(realm); })(); '
+               f'print("{sentinel}");\n')
+    # Watchdog for testcases that never return (infinite loops): killing
+    # the worker forces EOF on its stdout, unblocking the read loop. The
+    # fresh-fork fallback enforces the same deadline via run_command.
+    watchdog = threading.Timer(_D8_REPL_TIMEOUT, worker.kill)
+    got_sentinel = False
+    lines = []
+    with worker_lock:
+        try:
+            worker.stdin.write(command)
+            worker.stdin.flush()
+            watchdog.start()
+            for line in worker.stdout:
+                if sentinel in line:
+                    got_sentinel = True
+                    break
+                lines.append(line)
+        except (BrokenPipeError, OSError):
+            pass
+        finally:
+            watchdog.cancel()
+        if not got_sentinel:
+            # Timed out, crashed, or the pipe broke: the worker state is
+            # unknown, so retire it and let the caller fall back.
+            _evict_d8_worker(flags, worker)
+            return None
+    return ''.join(lines)
+
+
+def _write_record(path, data):
+    # Raw fd write: one open/write/close without the buffered-TextIO layer,
+    # which matters at fuzzing record rates.
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if data:
+            os.write(fd, data)
+    finally:
+        os.close(fd)
+
+
+@functools.lru_cache(maxsize=512)
+def _run_d8_cached(target, options, stamp):
+    base = os.path.join(OUTPUT_DIRECTORY, os.path.basename(target))
+    # Sorted flags so equivalent orderings share one warm worker.
+    output = _run_d8_on_worker(target, tuple(sorted(shlex.split(options))))
+    if output is not None:
+        _write_record(base + '.out', output.encode())
+        _write_record(base + '.err', b'')
+        return output
+    # Capture bytes: the records are written verbatim, so only output that is
+    # actually returned to the agent gets decoded. On multi-MB trace output
+    # this skips a full decode+encode round-trip.
+    completed_process = run_command_bytes(
+        [D8_PATH, *shlex.split(options), target], timeout=60)
+    if not completed_process:
+        # Record the failed run too, so consumers of the .out/.err pair never
+        # see a stale record from a previous run of the same target.
+        _write_record(base + '.out', b'')
+        _write_record(base + '.err', b'')
+        return ''
+    _write_record(base + '.out', completed_process.stdout)
+    _write_record(base + '.err', completed_process.stderr)
+    return get_output(completed_process)
+
+
+# The d8 flags agents are expected to use. Validating against this locally
+# turns a malformed call into an immediate error string instead of a wasted
+# V8 startup that ends in d8 rejecting the flag.
+_ALLOWED_D8_FLAGS = frozenset({
+    '--allow-natives-syntax', '--always-turbofan', '--expose-gc', '--harmony',
+    '--jit-fuzzing', '--no-opt', '--print-bytecode', '--print-code',
+    '--stack-size', '--trace-deopt', '--trace-gc', '--trace-opt',
+    '--trace-turbo', '--trace-turbo-graph', '--trace-turbo-path',
+})
+
+
+def _validate_d8_options(options):
+    """Return an error string for invalid d8 options, or None if they pass.
+
+    Shared by run_d8 and arun_d8 so both entry points enforce the same
+    flag policy."""
+    flags = [t.split('=', 1)[0] for t in shlex.split(options)]
+    unknown = [f for f in flags if f not in _ALLOWED_D8_FLAGS]
+    if unknown:
+        return f"Unsupported d8 options: {' '.join(unknown)}"
+    if len(flags) > 4:
+        return 'At most 4 d8 flags are supported'
+    if '--trace-turbo-graph' in flags and '--trace-turbo-path' not in flags:
+        return '--trace-turbo-graph must be paired with --trace-turbo-path'
+    return None
+
+
+@tool
+def run_d8(target: str, options: str = '') -> str:
+    """Run a JS testcase under d8. Up to 4 d8 flags can be passed via options;
+    --trace-turbo-graph must be paired with --trace-turbo-path."""
+    error = _validate_d8_options(options)
+    if error:
+        return error
+    return _run_d8_cached(target, options, _file_stamp(target))
+
+
+# ---------------------------------------------------------------------------
+# Async variants
+#
+# The @tool wrappers above are synchronous; these let callers fan out
+# independent searches/runs and pay only the slowest one. They all run on a
+# private event loop in a daemon thread, with concurrency capped at the CPU
+# count, and gather_tools() bridges back to sync code.
+# ---------------------------------------------------------------------------
+
+_AIO_LOOP = None
+_AIO_SEM = None
+
+
+def _aio_loop():
+    global _AIO_LOOP
+    if _AIO_LOOP is None:
+        _AIO_LOOP = asyncio.new_event_loop()
+        threading.Thread(target=_AIO_LOOP.run_forever,
+                         name='fog-aio', daemon=True).start()
+    return _AIO_LOOP
+
+
+async def _with_sem(coro):
+    global _AIO_SEM
+    if _AIO_SEM is None:
+        _AIO_SEM = asyncio.Semaphore(os.cpu_count() or 4)
+    async with _AIO_SEM:
+        return await coro
+
+
+async def aripgrep(pattern: str, options: str = '') -> str:
+    """Async ripgrep; see ripgrep()."""
+    proc = await asyncio.create_subprocess_exec(
+        *_rg_argv(pattern, options),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    stdout, _ = await proc.communicate()
+    return _rg_collect(stdout.splitlines())
+
+
+async def alookup(query: str) -> str:
+    """Async lookup; see lookup()."""
+    # The cached/HTTP path is blocking; a worker thread keeps the loop free.
+    return await asyncio.to_thread(_lookup_cached, ' '.join(query.lower().split()))
+
+
+async def arun_d8(target: str, options: str = '') -> str:
+    """Async run_d8; see run_d8()."""
+    error = _validate_d8_options(options)
+    if error:
+        return error
+    return await asyncio.to_thread(_run_d8_cached, target, options,
+                                   _file_stamp(target))
+
+
+def gather_tools(coros):
+    """Run several async tool calls concurrently and return their results
+    in order. Callable from synchronous code."""
+    async def _gather():
+        return await asyncio.gather(*(_with_sem(c) for c in coros))
+    return asyncio.run_coroutine_threadsafe(_gather(), _aio_loop()).result()
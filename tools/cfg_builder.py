@@ -0,0 +1,703 @@
+"""Control-flow-graph extraction for the V8 source tree via libclang.
+
+CFGBuilder parses C++ files with clang.cindex, builds a per-function CFG of
+statement-level nodes (plus synthetic ENTRY/EXIT/MERGE nodes for structured
+control flow), and serves them to the agent tools as nested trees. Parsed
+results are cached on disk keyed by source content, so only changed files
+ever pay the clang frontend cost again.
+"""
+
+import concurrent.futures
+import fnmatch
+import functools
+import hashlib
+import os
+import pickle
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import orjson
+
+from clang.cindex import Config, CursorKind, Index, TranslationUnit
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+# Salt for the on-disk cache: a different libclang or a schema change must
+# not serve stale CFGs.
+_CACHE_SCHEMA = 1
+_LIB_ID = Config.library_file or Config.library_path or ''
+
+# Nearly every V8 .cc file pulls the same heavy header closure; with a
+# precompiled preamble clang builds that prefix once per TU and reuses it on
+# reparses instead of re-tokenizing the includes.
+_PARSE_OPTIONS = (TranslationUnit.PARSE_PRECOMPILED_PREAMBLE
+                  | TranslationUnit.PARSE_CACHE_COMPLETION_RESULTS)
+
+
+class CFGNode:
+    def __init__(self, kind, location, content):
+        # Assigned by CFG.add_node (or JSON reconstruction); ids are dense
+        # per CFG, not global.
+        self.id = None
+        self.kind = kind
+        self.location = location
+        self.content = content
+        self.successors = []
+        self.predecessors = []
+        self._succ_ids = set()
+
+    def add_successor(self, node):
+        # Set-backed dedup: the list membership test was O(successors) per
+        # edge, quadratic on wide nodes like big switch dispatches.
+        if node.id not in self._succ_ids:
+            self._succ_ids.add(node.id)
+            self.successors.append(node)
+            node.predecessors.append(self)
+
+
+# Synthetic-node content, interned once: every if statement in the tree gets
+# a MERGE node, so one shared string object replaces millions of copies.
+_IF_MERGE = sys.intern('if_merge')
+_SWITCH_MERGE = sys.intern('switch_merge')
+_EXIT = sys.intern('exit')
+_LOOP_EXITS = {'while': sys.intern('while_exit'), 'for': sys.intern('for_exit')}
+
+# Node kinds are a tiny closed set; CFGs store one uint8 id per node and
+# share these tables.
+_KIND_IDS = {}
+_KIND_NAMES = []
+
+
+def _kind_id(kind):
+    kid = _KIND_IDS.get(kind)
+    if kid is None:
+        kid = _KIND_IDS[kind] = len(_KIND_NAMES)
+        _KIND_NAMES.append(kind)
+    return kid
+
+
+class CFG:
+    """One function's control-flow graph.
+
+    CFGNode objects exist only while the graph is being built; finalize()
+    freezes them into a struct-of-arrays form (uint8 kind ids, uint32 lines,
+    CSR adjacency) that is an order of magnitude smaller and lets traversal
+    run over plain integer arrays.
+    """
+
+    def __init__(self, function_name, file_path):
+        self.function_name = function_name
+        self.file_path = file_path
+        self.nodes = {}
+        self.entry = None
+        self.exit = None
+        self.node_ids = np.empty(0, np.int64)
+        self.kind_ids = np.empty(0, np.uint8)
+        self.lines = np.empty(0, np.uint32)
+        self.indptr = np.zeros(1, np.int64)
+        self.indices = np.empty(0, np.int32)
+        self.contents = []
+        self.locations = []
+        self.entry_index = 0
+        self.exit_index = 0
+        self._next_id = 0
+
+    def add_node(self, kind, location, content):
+        node = CFGNode(kind, location, content)
+        node.id = self._next_id
+        self._next_id += 1
+        self.nodes[node.id] = node
+        return node
+
+    def finalize(self):
+        """Freeze the built node graph into the array layout and drop the
+        per-node Python objects."""
+        nodes = list(self.nodes.values())
+        count = len(nodes)
+        index_of = {node.id: i for i, node in enumerate(nodes)}
+        self.node_ids = np.fromiter((n.id for n in nodes), np.int64, count)
+        self.kind_ids = np.fromiter((_kind_id(n.kind) for n in nodes),
+                                    np.uint8, count)
+        self.lines = np.fromiter((n.location[1] for n in nodes),
+                                 np.uint32, count)
+        self.contents = [n.content for n in nodes]
+        self.locations = [n.location for n in nodes]
+        self.indptr = np.zeros(count + 1, np.int64)
+        np.cumsum([len(n.successors) for n in nodes], out=self.indptr[1:])
+        self.indices = np.fromiter(
+            (index_of[succ.id] for n in nodes for succ in n.successors),
+            np.int32, int(self.indptr[-1]))
+        if self.entry is not None:
+            self.entry_index = index_of[self.entry.id]
+        if self.exit is not None:
+            self.exit_index = index_of[self.exit.id]
+        self.nodes = {}
+        self.entry = None
+        self.exit = None
+
+    def successors_of(self, index):
+        return self.indices[self.indptr[index]:self.indptr[index + 1]]
+
+    def to_dict(self):
+        node_count = self.node_ids.size
+        return {
+            'function_name': self.function_name,
+            'file': self.file_path,
+            'entry': int(self.node_ids[self.entry_index]) if node_count else None,
+            'exit': int(self.node_ids[self.exit_index]) if node_count else None,
+            'nodes': {
+                str(self.node_ids[i]): {
+                    'kind': _KIND_NAMES[self.kind_ids[i]],
+                    'location': {'file': self.locations[i][0],
+                                 'line': self.locations[i][1],
+                                 'column': self.locations[i][2]},
+                    'content': self.contents[i],
+                    'successors': [int(self.node_ids[j])
+                                   for j in self.successors_of(i)],
+                }
+                for i in range(node_count)
+            },
+        }
+
+
+# Directories that never hold sources we want CFGs for.
+_SKIP_DIRS = frozenset({'build', 'out', 'test', 'third_party'})
+
+
+def _walk(root, match):
+    """Yield matching file paths under root via os.scandir.
+
+    Unlike Path.rglob this creates no PosixPath objects and classifies
+    entries from the dirent type instead of a stat per entry.
+    """
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not name.startswith('.') and name not in _SKIP_DIRS:
+                        stack.append(entry.path)
+                elif match(name):
+                    yield entry.path
+
+
+# Edge-event flags emitted by _tree_edges_csr.
+_EV_EXPAND = 0
+_EV_BACK_EDGE = 1
+_EV_SEEN = 2
+
+
+def _tree_edges_csr(entry, indptr, indices):
+    """DFS over a CSR adjacency, returning the visited edges in order.
+
+    Emits one (parent_depth, node, flag) triple per edge, in the order a
+    depth-first walk encounters them, so the caller can rebuild the nested
+    tree from the arrays alone. Each node is expanded exactly once: an edge
+    to a node on the current path is flagged as a back edge, an edge to a
+    node expanded earlier on another path as a reference. Without the
+    visited bitmap every merge node would re-expand the rest of the graph,
+    making the tree exponential in the number of sequential branches. Runs
+    over plain integer arrays only, which is what lets Numba compile it.
+    """
+    n = indptr.size - 1
+    visited = np.zeros(n, np.uint8)
+    in_path = np.zeros(n, np.uint8)
+    # Each node expands once, so each edge is emitted at most once.
+    cap = indices.size if indices.size else 1
+    ev_depth = np.empty(cap, np.int32)
+    ev_node = np.empty(cap, np.int32)
+    ev_flag = np.empty(cap, np.uint8)
+    count = 0
+    # The path holds distinct nodes, so depth is bounded by n.
+    stack_node = np.empty(n + 1, np.int32)
+    stack_ptr = np.empty(n + 1, np.int64)
+    top = 0
+    stack_node[0] = entry
+    stack_ptr[0] = indptr[entry]
+    visited[entry] = 1
+    in_path[entry] = 1
+    while top >= 0:
+        node = stack_node[top]
+        ptr = stack_ptr[top]
+        if ptr == indptr[node + 1]:
+            in_path[node] = 0
+            top -= 1
+            continue
+        stack_ptr[top] = ptr + 1
+        succ = indices[ptr]
+        if in_path[succ]:
+            flag = _EV_BACK_EDGE
+        elif visited[succ]:
+            flag = _EV_SEEN
+        else:
+            flag = _EV_EXPAND
+        ev_depth[count] = top
+        ev_node[count] = succ
+        ev_flag[count] = flag
+        count += 1
+        if flag == _EV_EXPAND:
+            visited[succ] = 1
+            in_path[succ] = 1
+            top += 1
+            stack_node[top] = succ
+            stack_ptr[top] = indptr[succ]
+    return ev_depth[:count], ev_node[:count], ev_flag[:count]
+
+
+if njit is not None:
+    _tree_edges_csr = njit(cache=True)(_tree_edges_csr)
+
+
+def _parse_one(file_path, v8_src_path, compile_args):
+    """Parse one file in a worker process and return its CFGs as dicts."""
+    builder = CFGBuilder(v8_src_path, compile_args)
+    builder.parse_file(file_path)
+    return {name: cfg.to_dict() for name, cfg in builder.cfgs.items()}
+
+
+class CFGBuilder:
+    _cache_dir = Path('/tmp/fuzzilli-cfg-cache')
+
+    def __init__(self, v8_src_path, compile_args=None):
+        self.index = Index.create()
+        self.v8_src_path = Path(v8_src_path)
+        self.compile_args = compile_args or [
+            '-x', 'c++', '-std=c++17',
+            f'-I{self.v8_src_path}', f'-I{self.v8_src_path / "include"}',
+        ]
+        self.cfgs = {}
+        # Retained translation units, so re-parsing a file the agent keeps
+        # probing goes through tu.reparse() and reuses the preamble PCH.
+        self._tu_pool = {}
+        # path -> (bytes, line-start offsets); bounded, LRU eviction.
+        self._file_cache = {}
+        # Bare function name -> full names, for O(1) lookup instead of a
+        # substring scan over every CFG.
+        self._name_index = {}
+
+    def _register_cfg(self, full_name, cfg):
+        self.cfgs[full_name] = cfg
+        self._name_index.setdefault(cfg.function_name, []).append(full_name)
+
+    # -- parsing ----------------------------------------------------------
+
+    def _cache_key(self, file_path):
+        h = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            h.update(f.read())
+        h.update(repr(self.compile_args).encode())
+        h.update(f'{_CACHE_SCHEMA}:{_LIB_ID}'.encode())
+        return h.hexdigest()
+
+    def parse_file(self, file_path):
+        """Build CFGs for every function defined in file_path.
+
+        The clang frontend only runs when the (source bytes, compile args,
+        libclang) combination has not been seen before; otherwise the CFGs
+        are reloaded from the per-file disk cache.
+        """
+        cache_path = self._cache_dir / f'{self._cache_key(file_path)}.pkl'
+        try:
+            with open(cache_path, 'rb') as f:
+                cached = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            cached = None
+        if cached is not None:
+            for full_name, data in cached.items():
+                self._register_cfg(full_name, self._cfg_from_dict(data))
+            return
+        before = set(self.cfgs)
+        tu = self._tu_pool.get(str(file_path))
+        if tu is None:
+            tu = self.index.parse(str(file_path), args=self.compile_args,
+                                  options=_PARSE_OPTIONS)
+            if len(self._tu_pool) >= 16:
+                # TUs are heavyweight; drop the oldest retained one.
+                self._tu_pool.pop(next(iter(self._tu_pool)))
+            self._tu_pool[str(file_path)] = tu
+        else:
+            tu.reparse()
+        self.traverse_ast(tu.cursor)
+        added = {name: self.cfgs[name].to_dict()
+                 for name in self.cfgs.keys() - before}
+        os.makedirs(self._cache_dir, exist_ok=True)
+        tmp = cache_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(added, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache_path)
+
+    def _git_dirty(self, dir_path):
+        """Absolute paths of files modified or untracked relative to HEAD,
+        or None when dir_path is not inside a git work tree."""
+        def git(*args):
+            return subprocess.run(['git', '-C', str(dir_path), *args],
+                                  capture_output=True, text=True)
+
+        toplevel = git('rev-parse', '--show-toplevel')
+        if toplevel.returncode != 0:
+            return None
+        changed = git('diff', '--name-only', 'HEAD')
+        untracked = git('ls-files', '--others', '--exclude-standard')
+        if changed.returncode != 0 or untracked.returncode != 0:
+            return None
+        root = toplevel.stdout.strip()
+        return {os.path.join(root, line)
+                for line in (changed.stdout + untracked.stdout).splitlines()
+                if line}
+
+    def parse_directory(self, dir_path, pattern='*.cc'):
+        # One worker process per core: clang parsing is compute-bound and the
+        # Python-side cursor walk holds the GIL, so threads would not scale.
+        # Workers ship back plain dicts (libclang objects cannot cross the
+        # process boundary) and share the same on-disk parse cache.
+        match = re.compile(fnmatch.translate(pattern)).match
+        files = list(_walk(str(dir_path), match))
+        # In a git tree, files that are clean relative to HEAD load straight
+        # from the cache via the path -> key manifest, without even re-hashing
+        # their content; only the dirty subset goes to the parse pool.
+        manifest_path = self._cache_dir / 'manifest.json'
+        try:
+            with open(manifest_path, 'rb') as f:
+                manifest = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            manifest = {}
+        dirty = self._git_dirty(dir_path)
+        pending = []
+        for file_path in files:
+            abs_path = os.path.abspath(file_path)
+            key = manifest.get(abs_path)
+            if dirty is None or abs_path in dirty or key is None:
+                pending.append(file_path)
+                continue
+            try:
+                with open(self._cache_dir / f'{key}.pkl', 'rb') as f:
+                    cached = pickle.load(f)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pending.append(file_path)
+                continue
+            for full_name, data in cached.items():
+                self._register_cfg(full_name, self._cfg_from_dict(data))
+        worker = functools.partial(_parse_one, v8_src_path=str(self.v8_src_path),
+                                   compile_args=self.compile_args)
+        with concurrent.futures.ProcessPoolExecutor(
+                max_workers=os.cpu_count()) as pool:
+            for i, result in enumerate(pool.map(worker, pending, chunksize=4)):
+                if i % 100 == 0:
+                    print(f'parsed {i}/{len(pending)} files')
+                for full_name, data in result.items():
+                    self._register_cfg(full_name, self._cfg_from_dict(data))
+        for file_path in pending:
+            try:
+                manifest[os.path.abspath(file_path)] = self._cache_key(file_path)
+            except OSError:
+                continue
+        os.makedirs(self._cache_dir, exist_ok=True)
+        tmp = manifest_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(orjson.dumps(manifest))
+        os.replace(tmp, manifest_path)
+
+    # Function definitions only ever live at the top level or inside these
+    # declaration containers; everything else (statements, expressions,
+    # types) can be skipped wholesale instead of walked.
+    # Membership tests run on raw enum ints: hashing a CursorKind object
+    # goes through enum __hash__ dispatch on every child of every TU root,
+    # while .value is a plain int lookup.
+    _CONTAINER_KIND_VALUES = frozenset(kind.value for kind in (
+        CursorKind.NAMESPACE, CursorKind.CLASS_DECL, CursorKind.STRUCT_DECL,
+        CursorKind.CLASS_TEMPLATE, CursorKind.UNEXPOSED_DECL,
+        CursorKind.LINKAGE_SPEC,
+    ))
+    _FUNC_KIND_VALUES = frozenset(kind.value for kind in (
+        CursorKind.FUNCTION_DECL, CursorKind.CXX_METHOD))
+
+    def traverse_ast(self, cursor):
+        queue = [cursor]
+        while queue:
+            # Single pass over the child iterator; a TU root can have 10k+
+            # children and get_children() materializes them per call.
+            for child in queue.pop().get_children():
+                kind_value = child.kind.value
+                if kind_value in self._FUNC_KIND_VALUES:
+                    # Header-declared cursors are the bulk of a V8 TU and
+                    # never get CFGs; the location check prunes them. It
+                    # runs after the kind test because the kind read is one
+                    # ctypes int while the location read is three objects.
+                    if self._in_tree(child) and child.is_definition():
+                        self.build_function_cfg(child)
+                elif kind_value in self._CONTAINER_KIND_VALUES:
+                    if self._in_tree(child):
+                        queue.append(child)
+
+    def _in_tree(self, cursor):
+        return (cursor.location.file is not None
+                and str(cursor.location.file.name).startswith(str(self.v8_src_path)))
+
+    # -- CFG construction -------------------------------------------------
+
+    # Loop label per loop cursor kind; also the membership test for loops.
+    _LOOP_LABELS = {
+        CursorKind.WHILE_STMT: 'while', CursorKind.DO_STMT: 'while',
+        CursorKind.FOR_STMT: 'for', CursorKind.CXX_FOR_RANGE_STMT: 'for',
+    }
+
+    def build_function_cfg(self, cursor):
+        """Build one function's CFG with an explicit worklist.
+
+        The old process_* methods were mutually recursive, mirroring
+        statement nesting depth in Python frames; deeply nested V8 code
+        could hit the recursion limit, and every frame cost interpreter
+        overhead. The worklist drives the same construction as a flat loop:
+        'stmt' tasks expand statements against the current predecessor set,
+        'set_preds' tasks restore it at branch boundaries, and 'join' tasks
+        are the merge continuations wiring branch exits into a join node.
+        """
+        # Every cursor attribute is a ctypes call into libclang; read each
+        # one exactly once per cursor and reuse the local.
+        spelling = cursor.spelling
+        location = self.get_location(cursor)
+        file_name = location[0]
+        full_name = f'{os.path.relpath(file_name, self.v8_src_path)}::{spelling}'
+        cfg = CFG(spelling, file_name)
+        cfg.entry = cfg.add_node('ENTRY', location, spelling)
+        preds = [cfg.entry]
+        work = [('stmt', child) for child in cursor.get_children()
+                if child.kind == CursorKind.COMPOUND_STMT]
+        work.reverse()
+        while work:
+            op, arg = work.pop()
+            if op == 'set_preds':
+                preds = arg
+                continue
+            if op == 'join':
+                for pred in preds:
+                    pred.add_successor(arg)
+                continue
+            preds = self._expand_statement(arg, cfg, preds, work)
+        cfg.exit = cfg.add_node('EXIT', self.get_location(cursor), _EXIT)
+        for pred in preds:
+            pred.add_successor(cfg.exit)
+        cfg.finalize()
+        self._register_cfg(full_name, cfg)
+
+    def _expand_statement(self, cursor, cfg, preds, work):
+        """Handle one 'stmt' task; returns the new predecessor set and may
+        push follow-up tasks (executed in LIFO order, so they are appended
+        reversed)."""
+        kind = cursor.kind
+        if kind == CursorKind.COMPOUND_STMT:
+            work.extend(('stmt', child)
+                        for child in reversed(list(cursor.get_children())))
+            return preds
+        # One location read per cursor; the cond and merge/exit nodes of a
+        # branch all share it.
+        location = self.get_location(cursor)
+        if kind == CursorKind.IF_STMT:
+            children = list(cursor.get_children())
+            cond = cfg.add_node('CONDITION', location,
+                                self.get_cursor_content(children[0]) if children else 'if')
+            for pred in preds:
+                pred.add_successor(cond)
+            merge = cfg.add_node('MERGE', location, _IF_MERGE)
+            tasks = []
+            if len(children) > 1:
+                tasks += [('set_preds', [cond]), ('stmt', children[1]),
+                          ('join', merge)]
+            if len(children) > 2:
+                tasks += [('set_preds', [cond]), ('stmt', children[2]),
+                          ('join', merge)]
+            else:
+                cond.add_successor(merge)
+            tasks.append(('set_preds', [merge]))
+            work.extend(reversed(tasks))
+            return preds
+        if kind in self._LOOP_LABELS:
+            children = list(cursor.get_children())
+            label = self._LOOP_LABELS[kind]
+            cond = cfg.add_node('LOOP_CONDITION', location,
+                                self.get_cursor_content(children[0]) if children else label)
+            for pred in preds:
+                pred.add_successor(cond)
+            exit_node = cfg.add_node('LOOP_EXIT', location, _LOOP_EXITS[label])
+            cond.add_successor(exit_node)
+            tasks = [('set_preds', [exit_node])]
+            if children:
+                # Body exits join back to the condition: the back edge.
+                tasks = [('set_preds', [cond]), ('stmt', children[-1]),
+                         ('join', cond)] + tasks
+            work.extend(reversed(tasks))
+            return preds
+        if kind == CursorKind.SWITCH_STMT:
+            children = list(cursor.get_children())
+            cond = cfg.add_node('CONDITION', location,
+                                self.get_cursor_content(children[0]) if children else 'switch')
+            for pred in preds:
+                pred.add_successor(cond)
+            merge = cfg.add_node('MERGE', location, _SWITCH_MERGE)
+            if len(children) > 1:
+                work.extend(reversed([('set_preds', [cond]),
+                                      ('stmt', children[-1]), ('join', merge),
+                                      ('set_preds', [merge])]))
+            else:
+                cond.add_successor(merge)
+                work.append(('set_preds', [merge]))
+            return preds
+        if kind == CursorKind.RETURN_STMT:
+            node = cfg.add_node('RETURN', location, self.get_cursor_content(cursor))
+            for pred in preds:
+                pred.add_successor(node)
+            # Control flow ends here; EXIT is wired up at the end.
+            return [node]
+        node = cfg.add_node('STATEMENT', location, self.get_cursor_content(cursor))
+        for pred in preds:
+            pred.add_successor(node)
+        return [node]
+
+    # -- cursor helpers ---------------------------------------------------
+
+    def get_location(self, cursor):
+        # A 3-tuple with an interned path instead of a fresh dict per node:
+        # every node in a file repeats the same path string, and the dict
+        # shape is only needed at to_dict time.
+        location = cursor.location
+        file = location.file
+        file_name = sys.intern(str(file.name)) if file else ''
+        return (file_name, location.line, location.column)
+
+    def _file_bytes(self, path):
+        """Return (bytes, line-start offsets) for path, reading it once.
+
+        A cursor-dense file used to be re-read for every node; with the
+        offset index an extent maps to a byte slice in O(1).
+        """
+        cached = self._file_cache.pop(path, None)
+        if cached is None:
+            if len(self._file_cache) >= 16:
+                self._file_cache.pop(next(iter(self._file_cache)))
+            with open(path, 'rb') as f:
+                data = f.read()
+            newlines = np.flatnonzero(np.frombuffer(data, np.uint8) == ord('\n'))
+            cached = (data, np.concatenate(([0], newlines + 1)))
+        # Reinsert so iteration order doubles as recency order.
+        self._file_cache[path] = cached
+        return cached
+
+    def get_cursor_content(self, cursor):
+        extent = cursor.extent
+        start, end = extent.start, extent.end
+        file = start.file
+        if file is None:
+            return ''
+        data, line_starts = self._file_bytes(str(file.name))
+        try:
+            begin = line_starts[start.line - 1] + start.column - 1
+            stop = line_starts[end.line - 1] + end.column - 1
+        except IndexError:
+            return ''
+        return data[begin:stop].decode('utf-8', 'ignore').strip()
+
+    # -- queries ----------------------------------------------------------
+
+    def get_function_cfg(self, function_name):
+        """Return the CFG for the first function whose qualified name
+        contains function_name, rendered as a nested tree."""
+        exact = self._name_index.get(function_name)
+        if exact:
+            full_name = exact[0]
+            return {'function': full_name,
+                    'tree': self.build_tree(self.cfgs[full_name])}
+        # Linear substring scan only for partial names the index misses.
+        for full_name, cfg in self.cfgs.items():
+            if function_name in full_name:
+                return {'function': full_name, 'tree': self.build_tree(cfg)}
+        return None
+
+    def build_tree(self, cfg):
+        # The DFS itself runs in _tree_edges_csr over the CSR integer arrays
+        # (machine code when Numba is installed, interpreted otherwise);
+        # Python only builds the nested dicts at the serialization boundary,
+        # replaying the edge events against a stack of rendered nodes.
+        if not cfg.node_ids.size:
+            return {}
+
+        def render(i):
+            return {'id': int(cfg.node_ids[i]),
+                    'kind': _KIND_NAMES[cfg.kind_ids[i]],
+                    'content': cfg.contents[i], 'children': []}
+
+        entry = cfg.entry_index
+        root = render(entry)
+        depths, nodes, flags = _tree_edges_csr(entry, cfg.indptr, cfg.indices)
+        dict_stack = [root]
+        for k in range(depths.size):
+            del dict_stack[int(depths[k]) + 1:]
+            succ = int(nodes[k])
+            flag = flags[k]
+            if flag == _EV_EXPAND:
+                child = render(succ)
+                dict_stack[-1]['children'].append(child)
+                dict_stack.append(child)
+            else:
+                # A node reached again becomes a leaf pointing at the one
+                # place it is expanded: back_edge for loops, ref for merges.
+                leaf = {'id': int(cfg.node_ids[succ]),
+                        'kind': _KIND_NAMES[cfg.kind_ids[succ]]}
+                leaf['back_edge' if flag == _EV_BACK_EDGE else 'ref'] = True
+                dict_stack[-1]['children'].append(leaf)
+        return root
+
+    # -- serialization ----------------------------------------------------
+
+    def export_cfgs(self, output_path):
+        # Stream one CFG at a time: building the whole {name: to_dict()} map
+        # first would hold a second, dict-shaped copy of every CFG in memory
+        # for the duration of the dump. Each dict is serialized and freed
+        # before the next is built; the file stays byte-identical to the
+        # all-at-once orjson output.
+        with open(output_path, 'wb') as f:
+            f.write(b'{"total_functions":%d,"cfgs":{' % len(self.cfgs))
+            for i, (name, cfg) in enumerate(self.cfgs.items()):
+                if i:
+                    f.write(b',')
+                f.write(orjson.dumps(name))
+                f.write(b':')
+                f.write(orjson.dumps(cfg.to_dict()))
+            f.write(b'}}')
+
+    def load_from_json(self, input_path):
+        with open(input_path, 'rb') as f:
+            data = orjson.loads(f.read())
+        for full_name, cfg_data in data['cfgs'].items():
+            self._register_cfg(full_name, self._cfg_from_dict(cfg_data))
+
+    def _cfg_from_dict(self, data):
+        cfg = CFG(data['function_name'], data['file'])
+        for node_id, node_data in data['nodes'].items():
+            loc = node_data['location']
+            node = CFGNode(node_data['kind'],
+                           (sys.intern(loc['file']), loc['line'], loc['column']),
+                           node_data['content'])
+            node.id = int(node_id)
+            cfg.nodes[node.id] = node
+        cfg._next_id = max(cfg.nodes, default=-1) + 1
+        for node_id, node_data in data['nodes'].items():
+            node = cfg.nodes[int(node_id)]
+            for succ_id in node_data['successors']:
+                node.add_successor(cfg.nodes[succ_id])
+        if data.get('entry') is not None:
+            cfg.entry = cfg.nodes[data['entry']]
+        if data.get('exit') is not None:
+            cfg.exit = cfg.nodes[data['exit']]
+        cfg.finalize()
+        return cfg
@@ -0,0 +1,1048 @@
+"""Common agent tools for exploring the regression and template corpora.
+
+These functions are exposed to the LLM agent as tools. They operate on two
+JSON corpora: `regressions.json` (historical regression testcases with their
+JS source, FuzzIL representation and execution data) and `templates.json`
+(ProgramTemplate sources in both Swift and FuzzIL form), plus a small
+JSON-file RAG database the agent can read and write by ID.
+"""
+
+import asyncio
+import atexit
+import bisect
+import collections
+import functools
+import hashlib
+import itertools
+import mmap
+import os
+import random
+import re
+import sqlite3
+import string
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+import orjson
+from langchain_core.embeddings import Embeddings
+from langchain_core.tools import tool
+from rapidfuzz import fuzz
+from rapidfuzz import process as rprocess
+
+try:
+    import re2 as _re2
+except ImportError:
+    _re2 = None
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+def _require_env(name):
+    value = os.environ.get(name)
+    if not value:
+        print(f'{name} is not set')
+        sys.exit(1)
+    return value
+
+
+V8_PATH = _require_env('V8_PATH')
+FUZZILLI_PATH = _require_env('FUZZILLI_PATH')
+OUTPUT_DIRECTORY = _require_env('OUTPUT_DIRECTORY')
+RAG_DB_DIR = _require_env('RAG_DB_DIR')
+
+REGRESSIONS_JSON = os.path.join(FUZZILLI_PATH, 'regressions.json')
+TEMPLATES_JSON = os.path.join(FUZZILLI_PATH, 'templates.json')
+# Columnar siblings produced by tools/corpus_to_arrow.py; preferred when
+# present.
+REGRESSIONS_ARROW = os.path.splitext(REGRESSIONS_JSON)[0] + '.arrow'
+TEMPLATES_ARROW = os.path.splitext(TEMPLATES_JSON)[0] + '.arrow'
+RAG_DB_PATH = os.path.join(RAG_DB_DIR, 'rag_db.json')
+
+# Bound once so serialization in the tool hot paths skips the per-call
+# module-attribute lookup.
+_dumps = orjson.dumps
+
+
+def _read_arrow_corpus(path, fields):
+    """Load a corpus from an mmap'd Arrow IPC file, returning the usual
+    key -> entry dict. Skips JSON decoding entirely on warm starts."""
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    keys = table.column('key').to_pylist()
+    columns = [table.column(field).to_pylist() for field in fields]
+    return {key: dict(zip(fields, row)) for key, row in zip(keys, zip(*columns))}
+
+
+# Characters whose presence in a command string means it actually needs a
+# shell (pipelines, redirection, globs, quoting, expansion).
+_SHELL_CHARS = frozenset('|&;<>()$`\\"\'*?[]{}~#\n')
+
+
+def _prepare_command(command):
+    if isinstance(command, str):
+        if _SHELL_CHARS.isdisjoint(command):
+            return command.split(), False
+        return command, True
+    return command, False
+
+
+def run_command(command, timeout=120):
+    """Run a command and return the CompletedProcess, or None on error.
+
+    Prefer an argv list: it skips the /bin/sh hop and keeps arguments intact
+    without quoting. A plain string only goes through the shell when it
+    contains shell syntax; simple strings are split and exec'd directly,
+    saving a fork per call.
+
+    Output is captured as raw bytes; get_output() decodes the one stream
+    that is actually surfaced. text=True would eagerly decode both stdout
+    and stderr whether or not anyone reads them.
+    """
+    command, shell = _prepare_command(command)
+    try:
+        return subprocess.run(command, shell=shell,
+                              capture_output=True, timeout=timeout)
+    except (subprocess.TimeoutExpired, OSError) as e:
+        print(f'command failed: {e}')
+        return None
+
+
+# Kept as a separate name for call sites that specifically want bytes (disk
+# records, binary parsers); identical now that run_command stopped decoding.
+run_command_bytes = run_command
+
+
+@functools.lru_cache(maxsize=256)
+def _compile(regex):
+    # Prefer re2: it matches in linear time regardless of the (agent-supplied)
+    # pattern, where the backtracking stdlib engine can go exponential. Fall
+    # back to re for patterns re2 rejects, e.g. lookaround.
+    if _re2 is not None:
+        try:
+            return _re2.compile(regex, _re2.MULTILINE)
+        except _re2.error:
+            pass
+    return re.compile(regex, re.MULTILINE)
+
+
+def get_output(completed_process):
+    """Return the textual output of a completed process (stdout, else stderr)."""
+    if completed_process is None:
+        return ''
+    output = completed_process.stdout or completed_process.stderr or ''
+    # Exactly one decode, of the one stream that is surfaced. str happens
+    # only for processes run outside run_command with text=True.
+    if isinstance(output, bytes):
+        return output.decode('utf-8', 'replace')
+    return output
+
+
+# ---------------------------------------------------------------------------
+# Regression corpus (regressions.json)
+# ---------------------------------------------------------------------------
+
+_REGRESSIONS_CACHE = None
+
+# Normalized (lowercased) copies of each similarity-scored column, built once
+# at load so repeated similarity queries skip per-call preprocessing.
+_REGRESSION_KEYS = []
+_REGRESSION_KEYS_LOWER = []
+_REGRESSION_NORM = {}
+_REGRESSION_TOKENS = {}
+_REGRESSION_BIGRAMS = {}
+
+_REGRESSION_FIELDS = ('js', 'Fuzzilli', 'execution_data')
+
+_NO_POSTINGS = frozenset()
+
+
+def _build_bigram_index(column):
+    index = {}
+    for i, body in enumerate(column):
+        for j in range(len(body) - 1):
+            index.setdefault(body[j:j + 2], set()).add(i)
+    return index
+
+
+def _build_regression_cache(data):
+    global _REGRESSION_KEYS, _REGRESSION_KEYS_LOWER
+    global _REGRESSION_NORM, _REGRESSION_TOKENS, _REGRESSION_BIGRAMS
+    _REGRESSION_KEYS = list(data.keys())
+    _REGRESSION_KEYS_LOWER = [(key.lower(), key) for key in _REGRESSION_KEYS]
+    _REGRESSION_NORM = {
+        field: [value.get(field, '').lower() for value in data.values()]
+        for field in _REGRESSION_FIELDS
+    }
+    _REGRESSION_TOKENS = {
+        field: [frozenset(body.split()) for body in column]
+        for field, column in _REGRESSION_NORM.items()
+    }
+    # Character-bigram inverted index for the code corpora: a candidate that
+    # shares no bigram with the query cannot score, so similarity queries
+    # only consider the union of the query's posting lists.
+    _REGRESSION_BIGRAMS = {
+        field: _build_bigram_index(_REGRESSION_NORM[field])
+        for field in ('js', 'Fuzzilli')
+    }
+
+
+def _load_regressions_once():
+    global _REGRESSIONS_CACHE
+    if _REGRESSIONS_CACHE is None:
+        if pa is not None and os.path.exists(REGRESSIONS_ARROW):
+            _REGRESSIONS_CACHE = _read_arrow_corpus(REGRESSIONS_ARROW, _REGRESSION_FIELDS)
+        else:
+            with open(REGRESSIONS_JSON, 'rb') as f:
+                _REGRESSIONS_CACHE = orjson.loads(f.read())
+        _build_regression_cache(_REGRESSIONS_CACHE)
+    return _REGRESSIONS_CACHE
+
+
+@tool
+def get_js_entry_data_by_name(JS_File_Name: str) -> str:
+    """Get the full regression entry (JS, FuzzIL and execution data) for the given JS file name."""
+    data = _load_regressions_once()
+    entry = data.get(JS_File_Name)
+    if entry is None:
+        return f'No entry found for {JS_File_Name}'
+    return f'this is the entry data for {JS_File_Name}\n' + _dumps(entry).decode()
+
+
+@tool
+def get_js_file_by_name(JS_File_Name: str) -> str:
+    """Get the JavaScript source of the regression entry with the given JS file name."""
+    data = _load_regressions_once()
+    entry = data.get(JS_File_Name)
+    if entry is None:
+        return f'No entry found for {JS_File_Name}'
+    return entry.get('js', '')
+
+
+@tool
+def get_random_entry_data() -> str:
+    """Get a random regression entry from the corpus."""
+    data = _load_regressions_once()
+    # _REGRESSION_KEYS is built once at load; picking from it avoids
+    # materializing a fresh key list on every call.
+    key = random.choice(_REGRESSION_KEYS)
+    return f'this is the entry data for {key}\n' + _dumps(data[key]).decode()
+
+
+@tool
+def search_js_file_name_by_pattern(pattern: str) -> str:
+    """Search regression JS file names containing the given substring (case-insensitive)."""
+    _load_regressions_once()
+    pattern = pattern.lower()
+    # The lowered keys are computed once at load; the scan allocates nothing
+    # per entry.
+    results = [key for key_lower, key in _REGRESSION_KEYS_LOWER if pattern in key_lower]
+    if not results:
+        return 'No results found'
+    return '\n'.join(results)
+
+
+def _search_regex_regressions(regex, field, limit):
+    data = _load_regressions_once()
+    pattern = _compile(regex)
+
+    def matches():
+        for key, value in data.items():
+            body = value.get(field, '')
+            if pattern.search(body):
+                yield f'=== {key}\n{body}\n'
+
+    # Lazily consume at most `limit` matches; the scan stops as soon as the
+    # cap is reached instead of materializing every hit.
+    result = '\n'.join(itertools.islice(matches(), limit))
+    return result or 'No results found'
+
+
+@tool
+def search_regex_js(regex: str, limit: int = 50) -> str:
+    """Search the JS source of all regression entries with a regular expression. Returns at most `limit` matches."""
+    return _search_regex_regressions(regex, 'js', limit)
+
+
+@tool
+def search_regex_fuzzilli(regex: str, limit: int = 50) -> str:
+    """Search the FuzzIL code of all regression entries with a regular expression. Returns at most `limit` matches."""
+    return _search_regex_regressions(regex, 'Fuzzilli', limit)
+
+
+@tool
+def search_regex_execution_data(regex: str, limit: int = 50) -> str:
+    """Search the execution data of all regression entries with a regular expression. Returns at most `limit` matches."""
+    return _search_regex_regressions(regex, 'execution_data', limit)
+
+
+def _similar_regressions(base_name, field, threshold):
+    data = _load_regressions_once()
+    base_entry = data.get(base_name)
+    if base_entry is None:
+        return f'No entry found for {base_name}'
+    base = base_entry.get(field, '').lower()
+    keys = _REGRESSION_KEYS
+    column = _REGRESSION_NORM[field]
+    lb = len(base)
+    bigram_index = _REGRESSION_BIGRAMS.get(field)
+    if bigram_index is not None:
+        candidates = set()
+        for j in range(lb - 1):
+            candidates |= bigram_index.get(base[j:j + 2], _NO_POSTINGS)
+        if not candidates:
+            return 'No similar entries found'
+        viable = np.fromiter(candidates, dtype=np.int64)
+        viable.sort()
+    else:
+        viable = np.arange(len(column), dtype=np.int64)
+    # Token-set Jaccard prefilter: candidates whose token sets overlap too
+    # little with the query cannot reach the threshold under
+    # token_set_ratio, so the scorer never sees them. 0.6 corresponds to the
+    # default threshold of 80.
+    tokens_col = _REGRESSION_TOKENS[field]
+    base_tokens = frozenset(base.split())
+    jaccard_min = threshold * 0.0075
+    if base_tokens:
+        viable = np.array([i for i in viable
+                           if len(base_tokens & tokens_col[i])
+                           >= jaccard_min * len(base_tokens | tokens_col[i])],
+                          dtype=np.int64)
+    if viable.size == 0:
+        return 'No similar entries found'
+    choices = [column[i] for i in viable]
+    # Score the survivors in one vectorized multicore cdist call rather than
+    # a Python-level loop. The choices are pre-normalized at load time, so
+    # no processor runs per candidate.
+    scores = rprocess.cdist([base], choices, scorer=fuzz.token_set_ratio, processor=None,
+                            score_cutoff=threshold, workers=-1, dtype=np.uint8)[0]
+    idx = np.nonzero(scores >= threshold)[0]
+    results = sorted(((keys[viable[i]], int(scores[i]))
+                      for i in idx if keys[viable[i]] != base_name),
+                     key=lambda x: -x[1])
+    if not results:
+        return 'No similar entries found'
+    return '\n'.join(f'{key} (score {score})' for key, score in results)
+
+
+@tool
+def simliar_js_code(JS_File_Name: str) -> str:
+    """Find regression entries whose JS source is similar to the given entry's JS source."""
+    return _similar_regressions(JS_File_Name, 'js', 80)
+
+
+@tool
+def simliar_fuzzilli_code(JS_File_Name: str) -> str:
+    """Find regression entries whose FuzzIL code is similar to the given entry's FuzzIL code."""
+    return _similar_regressions(JS_File_Name, 'Fuzzilli', 80)
+
+
+@tool
+def simliar_execution_data(JS_File_Name: str) -> str:
+    """Find regression entries whose execution data is similar to the given entry's execution data."""
+    return _similar_regressions(JS_File_Name, 'execution_data', 60)
+
+
+# ---------------------------------------------------------------------------
+# Template corpus (templates.json)
+# ---------------------------------------------------------------------------
+
+_TEMPLATES_CACHE = None
+
+# Field keys of a template entry, bound once so the load-time pass does a
+# plain subscript per entry instead of resolving a string literal and the
+# .get default machinery on every iteration.
+_K_SWIFT = 'ProgramTemplateSwift'
+_K_FUZZIL = 'ProgramTemplateFuzzil'
+
+# Structure-of-arrays view over the template dict, plus one concatenated
+# haystack per corpus so a regex search is a single finditer pass instead of
+# one search call per template. The sentinel is a byte pair that cannot
+# appear in template sources.
+_SENTINEL = '\x01\x01'
+_TEMPLATE_KEYS = []
+_TEMPLATE_SWIFT = []
+_TEMPLATE_FUZZIL = []
+_SWIFT_HAYSTACK = ''
+_SWIFT_OFFSETS = []
+_FUZZIL_HAYSTACK = ''
+_FUZZIL_OFFSETS = []
+_TEMPLATE_SWIFT_TOKENS = []
+_TEMPLATE_FUZZIL_TOKENS = []
+
+_PUNCT_TRANS = str.maketrans('', '', string.punctuation)
+
+
+def _preprocess(body):
+    """Normalize a body for similarity scoring: lowercase, strip punctuation,
+    dedupe and sort tokens. Computed once per template at load time."""
+    return ' '.join(sorted(set(body.lower().translate(_PUNCT_TRANS).split())))
+
+
+def _build_haystack(bodies):
+    offsets = []
+    pos = 0
+    for body in bodies:
+        pos += len(body) + len(_SENTINEL)
+        offsets.append(pos)
+    return _SENTINEL.join(bodies), offsets
+
+
+def _build_template_cache(data):
+    global _TEMPLATE_KEYS, _TEMPLATE_SWIFT, _TEMPLATE_FUZZIL
+    global _SWIFT_HAYSTACK, _SWIFT_OFFSETS, _FUZZIL_HAYSTACK, _FUZZIL_OFFSETS
+    _TEMPLATE_KEYS = list(data.keys())
+    _TEMPLATE_SWIFT = [value[_K_SWIFT] if _K_SWIFT in value else '' for value in data.values()]
+    _TEMPLATE_FUZZIL = [value[_K_FUZZIL] if _K_FUZZIL in value else '' for value in data.values()]
+    _SWIFT_HAYSTACK, _SWIFT_OFFSETS = _build_haystack(_TEMPLATE_SWIFT)
+    _FUZZIL_HAYSTACK, _FUZZIL_OFFSETS = _build_haystack(_TEMPLATE_FUZZIL)
+    global _TEMPLATE_SWIFT_TOKENS, _TEMPLATE_FUZZIL_TOKENS
+    _TEMPLATE_SWIFT_TOKENS = [_preprocess(body) for body in _TEMPLATE_SWIFT]
+    _TEMPLATE_FUZZIL_TOKENS = [_preprocess(body) for body in _TEMPLATE_FUZZIL]
+
+
+def _load_templates_once():
+    # mmap the file and hand the mapping straight to orjson: no intermediate
+    # bytes copy of the (large) templates.json, and the kernel pages the file
+    # in on demand.
+    global _TEMPLATES_CACHE
+    if _TEMPLATES_CACHE is None:
+        if pa is not None and os.path.exists(TEMPLATES_ARROW):
+            _TEMPLATES_CACHE = _read_arrow_corpus(TEMPLATES_ARROW, (_K_SWIFT, _K_FUZZIL))
+            _build_template_cache(_TEMPLATES_CACHE)
+            return _TEMPLATES_CACHE
+        with open(TEMPLATES_JSON, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                _TEMPLATES_CACHE = orjson.loads(mm)
+            finally:
+                mm.close()
+        _build_template_cache(_TEMPLATES_CACHE)
+    return _TEMPLATES_CACHE
+
+
+@tool
+def get_template_by_name(template_name: str) -> str:
+    """Get the full template entry (Swift and FuzzIL form) for the given template name."""
+    data = _load_templates_once()
+    entry = data.get(template_name)
+    if entry is None:
+        return f'No template found for {template_name}'
+    return f'this is the template entry for {template_name}\n' + _dumps(entry).decode()
+
+
+@tool
+def get_random_template_swift() -> str:
+    """Get the Swift source of a random ProgramTemplate."""
+    _load_templates_once()
+    i = random.randrange(len(_TEMPLATE_KEYS))
+    return f'this is swift template for {_TEMPLATE_KEYS[i]}\n' + _TEMPLATE_SWIFT[i]
+
+
+@tool
+def get_random_template_fuzzil() -> str:
+    """Get the FuzzIL code of a random ProgramTemplate."""
+    _load_templates_once()
+    i = random.randrange(len(_TEMPLATE_KEYS))
+    return f'this is fuzzil template for {_TEMPLATE_KEYS[i]}\n' + _TEMPLATE_FUZZIL[i]
+
+
+def _search_haystack(regex, haystack, offsets, bodies, limit):
+    pattern = _compile(regex)
+    hits = set()
+    # finditer walks left to right, so once `limit` distinct templates have
+    # matched the rest of the haystack can be skipped.
+    for m in pattern.finditer(haystack):
+        hits.add(bisect.bisect_right(offsets, m.start()))
+        if len(hits) >= limit:
+            break
+    results = [f'=== {_TEMPLATE_KEYS[i]}\n{bodies[i]}\n' for i in sorted(hits)]
+    if not results:
+        return 'No results found'
+    return '\n'.join(results)
+
+
+@tool
+def search_regex_template_swift(regex: str, limit: int = 50) -> str:
+    """Search the Swift source of all templates with a regular expression. Returns at most `limit` matches."""
+    _load_templates_once()
+    return _search_haystack(regex, _SWIFT_HAYSTACK, _SWIFT_OFFSETS, _TEMPLATE_SWIFT, limit)
+
+
+@tool
+def search_regex_template_fuzzil(regex: str, limit: int = 50) -> str:
+    """Search the FuzzIL code of all templates with a regular expression. Returns at most `limit` matches."""
+    _load_templates_once()
+    return _search_haystack(regex, _FUZZIL_HAYSTACK, _FUZZIL_OFFSETS, _TEMPLATE_FUZZIL, limit)
+
+
+def _similar_templates(template_name, field, bodies, threshold):
+    data = _load_templates_once()
+    base_entry = data.get(template_name)
+    if base_entry is None:
+        return f'No template found for {template_name}'
+    base = _preprocess(base_entry.get(field, ''))
+    # One vectorized cdist call scores the whole corpus in C with all cores;
+    # score_cutoff lets the scorer bail out early on hopeless candidates.
+    scores = rprocess.cdist([base], bodies, scorer=fuzz.ratio,
+                            score_cutoff=threshold, workers=-1, dtype=np.uint8)[0]
+    idx = np.nonzero(scores >= threshold)[0]
+    results = sorted(((_TEMPLATE_KEYS[i], int(scores[i]))
+                      for i in idx if _TEMPLATE_KEYS[i] != template_name),
+                     key=lambda x: -x[1])
+    if not results:
+        return 'No similar templates found'
+    return '\n'.join(f'{key} (score {score})' for key, score in results)
+
+
+@tool
+def similar_template_swift(template_name: str) -> str:
+    """Find templates whose Swift source is similar to the given template's Swift source."""
+    _load_templates_once()
+    return _similar_templates(template_name, _K_SWIFT, _TEMPLATE_SWIFT_TOKENS, 80)
+
+
+@tool
+def similar_template_fuzzil(template_name: str) -> str:
+    """Find templates whose FuzzIL code is similar to the given template's FuzzIL code."""
+    _load_templates_once()
+    return _similar_templates(template_name, _K_FUZZIL, _TEMPLATE_FUZZIL_TOKENS, 80)
+
+
+@tool
+def search_template_file_json(pattern: str, return_topic: str) -> str:
+    """Search template names containing the given substring.
+
+    return_topic selects what is returned for each match: "swift" for the
+    Swift source, "fuzzil" for the FuzzIL code, or "all" for the full entry.
+    """
+    data = _load_templates_once()
+    # Dispatch on return_topic once instead of per match.
+    if return_topic == 'swift':
+        render = lambda key, value: f'=== {key}\n' + value.get(_K_SWIFT, '')
+    elif return_topic == 'fuzzil':
+        render = lambda key, value: f'=== {key}\n' + value.get(_K_FUZZIL, '')
+    else:
+        render = lambda key, value: f'=== {key}\n' + _dumps(value).decode()
+    # Agents usually pass an exact template name; answer that from the dict
+    # without scanning.
+    if pattern in data:
+        return render(pattern, data[pattern])
+    results = [render(key, value) for key, value in data.items() if pattern in key]
+    if not results:
+        return 'No results found'
+    return '\n'.join(results)
+
+
+# ---------------------------------------------------------------------------
+# RAG database (SQLite, WAL mode, keyed by ID)
+# ---------------------------------------------------------------------------
+
+RAG_DB_SQLITE = os.path.join(RAG_DB_DIR, 'rag_db.sqlite')
+
+_RAG_CONN = None
+_RAG_DIRTY_WRITES = 0
+_RAG_COMMIT_EVERY = 64
+
+# Serialized JSON bodies already read or written this session, so repeat
+# reads of a hot entry never reach SQLite. Guarded, like the connection, by
+# _RAG_LOCK since tools may be called from multiple threads.
+_RAG_CACHE = {}
+_RAG_LOCK = threading.RLock()
+
+
+def _rag_conn():
+    global _RAG_CONN
+    if _RAG_CONN is None:
+        os.makedirs(RAG_DB_DIR, exist_ok=True)
+        _RAG_CONN = sqlite3.connect(RAG_DB_SQLITE, check_same_thread=False)
+        _RAG_CONN.execute('PRAGMA journal_mode=WAL')
+        _RAG_CONN.execute('PRAGMA synchronous=NORMAL')
+        _RAG_CONN.execute('CREATE TABLE IF NOT EXISTS rag (id TEXT PRIMARY KEY, body BLOB)')
+        # One-time migration from the old single-JSON-file layout.
+        if os.path.exists(RAG_DB_PATH):
+            with open(RAG_DB_PATH, 'rb') as f:
+                old = orjson.loads(f.read())
+            _RAG_CONN.executemany('INSERT OR IGNORE INTO rag VALUES (?, ?)',
+                                  [(k, orjson.dumps(v)) for k, v in old.items()])
+            os.rename(RAG_DB_PATH, RAG_DB_PATH + '.migrated')
+        _RAG_CONN.commit()
+        atexit.register(_rag_flush)
+    return _RAG_CONN
+
+
+def _rag_flush():
+    global _RAG_DIRTY_WRITES
+    if _RAG_CONN is not None and _RAG_DIRTY_WRITES:
+        _RAG_CONN.commit()
+        _RAG_DIRTY_WRITES = 0
+
+
+def _parse_rag_entry(entry: str):
+    """Parse an agent-provided RAG entry into (id, payload).
+
+    Accepts either a JSON object with an "id"/"ID" field, or the looser
+    "ID:{...}" form the agent sometimes produces.
+    """
+    # Fast path: a well-formed JSON object returns immediately, without the
+    # substring scan the fallback form needs.
+    try:
+        obj = orjson.loads(entry)
+    except orjson.JSONDecodeError:
+        pass
+    else:
+        if isinstance(obj, dict):
+            entry_id = obj.get('id') or obj.get('ID')
+            if entry_id:
+                return str(entry_id), {k: v for k, v in obj.items() if k not in ('id', 'ID')}
+    pos = entry.find(':{')
+    if pos == -1:
+        return None, None
+    entry_id = entry[:pos].strip()
+    try:
+        payload = orjson.loads(entry[pos + 1:])
+    except orjson.JSONDecodeError:
+        payload = {'content': entry[pos + 1:]}
+    return entry_id, payload
+
+
+@tool
+def read_rag_db_id(entry_id: str) -> str:
+    """Read the RAG database entry stored under the given ID."""
+    with _RAG_LOCK:
+        body = _RAG_CACHE.get(entry_id)
+        if body is None:
+            row = _rag_conn().execute('SELECT body FROM rag WHERE id = ?', (entry_id,)).fetchone()
+            if row is None:
+                return f'No entry found for {entry_id}'
+            body = _RAG_CACHE[entry_id] = row[0].decode()
+    return body
+
+
+@tool
+def write_rag_db_id(entry: str) -> str:
+    """Store an entry in the RAG database. The entry must carry an ID (JSON "id" field or "ID:{...}" form)."""
+    global _RAG_DIRTY_WRITES
+    entry_id, payload = _parse_rag_entry(entry)
+    if entry_id is None:
+        return 'Could not parse an ID out of the entry'
+    body = _dumps(payload)
+    with _RAG_LOCK:
+        _rag_conn().execute('INSERT OR REPLACE INTO rag VALUES (?, ?)', (entry_id, body))
+        _RAG_CACHE[entry_id] = body.decode()
+        _RAG_DIRTY_WRITES += 1
+        if _RAG_DIRTY_WRITES >= _RAG_COMMIT_EVERY:
+            _rag_flush()
+    return f'Stored entry {entry_id}'
+
+
+# ---------------------------------------------------------------------------
+# RAG database (semantic search over a persistent vector store)
+# ---------------------------------------------------------------------------
+
+RAG_COLLECTION = 'fog'
+
+
+class _CachedEmbeddings(Embeddings):
+    """Embeddings wrapper with a persistent content-hash-keyed vector cache.
+
+    Agent loops re-issue the same queries constantly; a cache hit skips the
+    embedding round trip entirely, leaving only the vector search. The cache
+    lives next to the store so it survives restarts.
+    """
+
+    def __init__(self, inner, cache_dir):
+        import diskcache
+        self._inner = inner
+        self._cache = diskcache.Cache(cache_dir)
+
+    @staticmethod
+    def _key(text):
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def embed_query(self, text):
+        key = self._key(text)
+        vector = self._cache.get(key)
+        if vector is None:
+            vector = self._inner.embed_query(text)
+            self._cache[key] = vector
+        return vector
+
+    def embed_documents(self, texts):
+        keys = [self._key(text) for text in texts]
+        vectors = [self._cache.get(key) for key in keys]
+        misses = [i for i, vector in enumerate(vectors) if vector is None]
+        if misses:
+            # One batched call for all misses; hits never leave the process.
+            fresh = self._inner.embed_documents([texts[i] for i in misses])
+            for i, vector in zip(misses, fresh):
+                self._cache[keys[i]] = vector
+                vectors[i] = vector
+        return vectors
+
+
+@functools.lru_cache(maxsize=1)
+def _get_embeddings():
+    # One embeddings client for the process: constructing it per call
+    # re-initializes the HTTP client and model configuration every time.
+    # Imported lazily so tool calls that never touch the vector store do not
+    # pay for langchain_openai.
+    from langchain_openai import OpenAIEmbeddings
+    return _CachedEmbeddings(OpenAIEmbeddings(model='text-embedding-3-small'),
+                             os.path.join(RAG_DB_DIR, 'emb_cache'))
+
+
+# Backend selection: Chroma by default; RAG_BACKEND=faiss switches to a
+# FAISS HNSW index, whose queries stay logarithmic where Chroma's
+# brute-force fallback scans every vector — worth it once the collection
+# passes roughly 10k entries.
+RAG_BACKEND = os.getenv('RAG_BACKEND', 'chroma')
+
+
+def _faiss_dir(collection_name, persist_directory):
+    return os.path.join(persist_directory, f'{collection_name}_faiss')
+
+
+def _load_faiss(collection_name, persist_directory):
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    embeddings = _get_embeddings()
+    local_dir = _faiss_dir(collection_name, persist_directory)
+    if os.path.isdir(local_dir):
+        return FAISS.load_local(local_dir, embeddings,
+                                allow_dangerous_deserialization=True)
+    dim = len(embeddings.embed_query('dimension probe'))
+    # Scalar-quantized HNSW: fp16 codes halve vector memory and the bytes
+    # moved per distance computation during graph traversal, at well under
+    # 1% recall loss for these embeddings. QT_fp16 needs no training pass,
+    # unlike int8, so the index can keep growing incrementally from empty.
+    index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, 32)
+    return FAISS(embedding_function=embeddings, index=index,
+                 docstore=InMemoryDocstore(), index_to_docstore_id={})
+
+
+@functools.lru_cache(maxsize=4)
+def _get_vectorstore(collection_name, persist_directory):
+    # One vectorstore per (collection, directory): re-opening the persistent
+    # store re-reads the index from disk, hundreds of ms per call.
+    if RAG_BACKEND == 'faiss':
+        return _load_faiss(collection_name, persist_directory)
+    from langchain_chroma import Chroma
+    return Chroma(collection_name=collection_name,
+                  embedding_function=_get_embeddings(),
+                  persist_directory=persist_directory)
+
+
+def _compute_doc_id(content):
+    # Not a security boundary, just a stable id; blake2b is several times
+    # faster than sha1 on CPUs without SHA extensions. digest_size=20 keeps
+    # ids the same length as the sha1 ones already in the store.
+    return hashlib.blake2b(content.encode(), digest_size=20).hexdigest()
+
+
+# Two-tier response cache: exact query string, then cosine similarity of the
+# query embedding against the cached queries. Agent loops rephrase the same
+# question constantly; near-duplicates reuse the stored answer without any
+# vector search. Bounded, LRU eviction, cleared on writes.
+_QUERY_CACHE = collections.OrderedDict()  # query -> (unit embedding, result)
+_QUERY_CACHE_MAX = 512
+_QUERY_SIM_THRESHOLD = 0.97
+_QUERY_LOCK = threading.Lock()
+
+# Speculative prefetch: each store query fetches 8 hits, returns the top 4,
+# and stashes the tail. A follow-up landing near a recent query (cosine
+# above 0.9) is usually a drill-down on the same topic, so the stashed tail
+# answers it without touching the store. Short TTL — follow-ups arrive
+# within the next few agent steps or not at all.
+_PREFETCH_POOL = collections.OrderedDict()  # query -> (unit, result, deadline)
+_PREFETCH_MAX = 64
+_PREFETCH_TTL = 120.0
+_PREFETCH_SIM_THRESHOLD = 0.9
+
+
+def _read_rag_db(query):
+    with _QUERY_LOCK:
+        cached = _QUERY_CACHE.get(query)
+        if cached is not None:
+            _QUERY_CACHE.move_to_end(query)
+            return cached[1]
+    # Embed once and search by vector, so the semantic-cache check and the
+    # store query share a single embedding.
+    embedding = np.asarray(_get_embeddings().embed_query(query), np.float32)
+    unit = embedding / (np.linalg.norm(embedding) or 1.0)
+    with _QUERY_LOCK:
+        if _QUERY_CACHE:
+            entries = list(_QUERY_CACHE.values())
+            # One matrix-vector product scores every cached query at once.
+            scores = np.stack([e[0] for e in entries]) @ unit
+            best = int(np.argmax(scores))
+            if scores[best] >= _QUERY_SIM_THRESHOLD:
+                return entries[best][1]
+        # Insertion order doubles as expiry order: every entry gets the
+        # same TTL.
+        now = time.monotonic()
+        while _PREFETCH_POOL and next(iter(_PREFETCH_POOL.values()))[2] < now:
+            _PREFETCH_POOL.popitem(last=False)
+        if _PREFETCH_POOL:
+            entries = list(_PREFETCH_POOL.values())
+            scores = np.stack([e[0] for e in entries]) @ unit
+            best = int(np.argmax(scores))
+            if scores[best] >= _PREFETCH_SIM_THRESHOLD:
+                return entries[best][1]
+    docs = _get_vectorstore(RAG_COLLECTION, RAG_DB_DIR).similarity_search_by_vector(
+        embedding.tolist(), k=8)
+    if not docs:
+        return 'No results found'
+
+    def render(subset):
+        return '\n'.join(
+            f'=== {doc.metadata.get("id", _compute_doc_id(doc.page_content))}\n'
+            f'{doc.page_content}' for doc in subset)
+
+    result = render(docs[:4])
+    with _QUERY_LOCK:
+        _QUERY_CACHE[query] = (unit, result)
+        if len(_QUERY_CACHE) > _QUERY_CACHE_MAX:
+            _QUERY_CACHE.popitem(last=False)
+        if len(docs) > 4:
+            _PREFETCH_POOL[query] = (unit, render(docs[4:]),
+                                     time.monotonic() + _PREFETCH_TTL)
+            if len(_PREFETCH_POOL) > _PREFETCH_MAX:
+                _PREFETCH_POOL.popitem(last=False)
+    return result
+
+
+@tool
+def read_rag_db(query: str) -> str:
+    """Search the RAG database semantically and return the most relevant stored entries."""
+    return _read_rag_db(query)
+
+
+# Writes are buffered and flushed as one add_texts call: every flush costs
+# an embedding round trip and a store transaction regardless of batch size,
+# so batching amortizes both. A short timer bounds how stale a read after an
+# unflushed write can be.
+_WRITE_BUFFER = []  # (content, doc_id)
+_WRITE_LOCK = threading.Lock()
+_WRITE_FLUSH_AFTER = 0.5  # seconds
+_WRITE_FLUSH_SIZE = 32
+_WRITE_TIMER = None
+
+
+def _flush_rag_writes():
+    global _WRITE_TIMER
+    with _WRITE_LOCK:
+        batch = list(_WRITE_BUFFER)
+        _WRITE_BUFFER.clear()
+        if _WRITE_TIMER is not None:
+            _WRITE_TIMER.cancel()
+            _WRITE_TIMER = None
+    if not batch:
+        return
+    vectorstore = _get_vectorstore(RAG_COLLECTION, RAG_DB_DIR)
+    vectorstore.add_texts([content for content, _ in batch],
+                          ids=[doc_id for _, doc_id in batch])
+    if RAG_BACKEND == 'faiss':
+        # Chroma persists on its own; FAISS only lives in memory until saved.
+        vectorstore.save_local(_faiss_dir(RAG_COLLECTION, RAG_DB_DIR))
+    # Cached responses may no longer reflect the store.
+    with _QUERY_LOCK:
+        _QUERY_CACHE.clear()
+        _PREFETCH_POOL.clear()
+
+
+atexit.register(_flush_rag_writes)
+
+
+@tool
+def write_rag_db(content: str) -> str:
+    """Store a document in the RAG database for later semantic retrieval."""
+    global _WRITE_TIMER
+    doc_id = _compute_doc_id(content)
+    flush = False
+    with _WRITE_LOCK:
+        _WRITE_BUFFER.append((content, doc_id))
+        if len(_WRITE_BUFFER) >= _WRITE_FLUSH_SIZE:
+            flush = True
+        elif _WRITE_TIMER is None:
+            _WRITE_TIMER = threading.Timer(_WRITE_FLUSH_AFTER, _flush_rag_writes)
+            _WRITE_TIMER.daemon = True
+            _WRITE_TIMER.start()
+    if flush:
+        _flush_rag_writes()
+    return f'Stored entry {doc_id}'
+
+
+# ---------------------------------------------------------------------------
+# Web search
+# ---------------------------------------------------------------------------
+
+
+@functools.lru_cache(maxsize=1)
+def _get_openai():
+    from openai import OpenAI
+    return OpenAI()
+
+
+@functools.lru_cache(maxsize=1)
+def _get_async_openai():
+    from openai import AsyncOpenAI
+    return AsyncOpenAI()
+
+
+@tool
+def web_search(query: str) -> str:
+    """Search the web for the given query and return a synthesized answer."""
+    response = _get_openai().responses.create(
+        model='gpt-4o-mini', tools=[{'type': 'web_search_preview'}],
+        input=query)
+    return response.output_text
+
+
+# Async variants: both calls block for hundreds of ms to seconds, so when
+# the agent fans out several lookups these let them overlap. They compose
+# with FoG_tools.gather_tools like the other async tools.
+
+
+async def aweb_search(query: str) -> str:
+    """Async web_search; see web_search()."""
+    response = await _get_async_openai().responses.create(
+        model='gpt-4o-mini', tools=[{'type': 'web_search_preview'}],
+        input=query)
+    return response.output_text
+
+
+async def aread_rag_db(query: str) -> str:
+    """Async read_rag_db; see read_rag_db()."""
+    # Embedding and store lookups are blocking; a worker thread keeps the
+    # loop free.
+    return await asyncio.to_thread(_read_rag_db, query)
+
+
+# ---------------------------------------------------------------------------
+# File reading
+# ---------------------------------------------------------------------------
+
+SECTION_LINES = 3000
+
+# path -> (mtime_ns, size, line-start byte offsets, line count). With the
+# offset index any section start is located in O(1): reading section 7 of a
+# 30k-line file seeks straight to it instead of scanning the six sections
+# before it. Agents re-read the same sources dozens of times, so the index
+# is built once per file version.
+_NEWLINE_IDX = {}
+
+# Joined once at import so the v8/ fast path below is one concatenation.
+_V8_PREFIX = V8_PATH.rstrip(os.sep) + os.sep
+
+
+@functools.lru_cache(maxsize=2048)
+def _resolve(file_path):
+    # Agents read the same handful of paths hundreds of times; caching the
+    # resolution skips the isabs/startswith/join work and reuses one str.
+    if os.path.isabs(file_path):
+        return file_path
+    if file_path.startswith('v8/'):
+        return _V8_PREFIX + file_path[3:]
+    return os.path.join(FUZZILLI_PATH, file_path)
+
+
+def _line_index(resolved_path, st):
+    cached = _NEWLINE_IDX.get(resolved_path)
+    if cached is not None and cached[:2] == (st.st_mtime_ns, st.st_size):
+        return cached[2], cached[3]
+    if st.st_size == 0:
+        starts = np.zeros(1, np.int64)
+    else:
+        with open(resolved_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            # Vectorized newline scan over the mapped bytes: one SIMD
+            # compare pass inside NumPy instead of a Python loop over lines.
+            buf = np.frombuffer(mm, np.uint8)
+            starts = np.concatenate(([0], np.flatnonzero(buf == ord('\n')) + 1))
+            del buf
+            mm.close()
+    # No trailing newline means one final partial line past the last offset.
+    line_count = starts.size - 1 if int(starts[-1]) == st.st_size else starts.size
+    _NEWLINE_IDX[resolved_path] = (st.st_mtime_ns, st.st_size, starts, line_count)
+    return starts, line_count
+
+
+@tool
+def read_file(file_path: str, section: int = 1) -> str:
+    """Read a section (3000 lines) of a file. Paths starting with "v8/" resolve inside the V8 checkout."""
+    resolved_path = _resolve(file_path)
+    try:
+        st = os.stat(resolved_path)
+        starts, line_count = _line_index(resolved_path, st)
+    except OSError:
+        return f'File not found: {resolved_path}'
+    total_sections = max(1, (line_count + SECTION_LINES - 1) // SECTION_LINES)
+    if section < 1 or section > total_sections:
+        return f'Invalid section {section}, file has {total_sections} sections'
+    first = (section - 1) * SECTION_LINES
+    last = min(section * SECTION_LINES, line_count)
+    begin = int(starts[first])
+    end = int(starts[last]) if last < starts.size else st.st_size
+    try:
+        with open(resolved_path, 'rb') as f:
+            f.seek(begin)
+            content = f.read(end - begin).decode('utf-8', 'replace')
+    except OSError:
+        return f'File not found: {resolved_path}'
+    header = f'{resolved_path} section {section}/{total_sections} ({line_count} lines total)\n'
+    return header + content
+
+
+# ---------------------------------------------------------------------------
+# V8 control-flow graphs
+# ---------------------------------------------------------------------------
+
+# Optional pre-built export from CFGBuilder.export_cfgs; loading it is
+# seconds where parsing the V8 tree from source is minutes to hours.
+V8_CFG_JSON = os.getenv('V8_CFG_JSON')
+
+
+@functools.lru_cache(maxsize=1)
+def _get_cfg_builder():
+    # Built on first use, never at import: most tool invocations never touch
+    # CFGs and must not pay for the V8 tree. The import is deferred for the
+    # same reason — clang bindings only load when a CFG is actually wanted.
+    from tools.cfg_builder import CFGBuilder
+    builder = CFGBuilder(V8_PATH)
+    if V8_CFG_JSON and os.path.exists(V8_CFG_JSON):
+        builder.load_from_json(V8_CFG_JSON)
+    else:
+        builder.parse_directory(V8_PATH)
+    return builder
+
+
+@functools.lru_cache(maxsize=4096)
+def _function_cfg_rendered(function_name):
+    # Agents probe the same function cluster repeatedly within a reasoning
+    # step; the rendered string is cached so only the first lookup pays the
+    # tree expansion and serialization.
+    result = _get_cfg_builder().get_function_cfg(function_name)
+    if result is None:
+        return f'No CFG found for {function_name}'
+    return f'this is the CFG for {result["function"]}\n' + _dumps(result['tree']).decode()
+
+
+@tool
+def find_function_cfg(function_name: str) -> str:
+    """Get the control-flow graph of a V8 C++ function as a nested tree."""
+    return _function_cfg_rendered(function_name)
+
+
+@tool
+def find_function_cfgs(function_names: list[str]) -> str:
+    """Get the control-flow graphs of several V8 C++ functions in one call."""
+    # One tool call instead of N; duplicates in the list collapse through
+    # the cache. The per-name work is pure CPython under the GIL, so a
+    # thread pool would add overhead without parallelism.
+    return '\n'.join(_function_cfg_rendered(name) for name in function_names)
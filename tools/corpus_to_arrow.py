@@ -0,0 +1,41 @@
+"""One-time migration of the JSON corpora to Arrow IPC files.
+
+Converts regressions.json and templates.json into columnar .arrow siblings
+(one column per entry field). When these exist, common_tools mmaps them at
+load time instead of parsing the JSON, which is both faster and avoids
+holding a second decoded copy of the file during startup.
+
+Usage: python -m tools.corpus_to_arrow
+"""
+
+import os
+
+import orjson
+import pyarrow as pa
+
+from tools.common_tools import (REGRESSIONS_JSON, TEMPLATES_JSON,
+                                _K_FUZZIL, _K_SWIFT, _REGRESSION_FIELDS)
+
+
+def convert(json_path, arrow_path, fields):
+    with open(json_path, 'rb') as f:
+        data = orjson.loads(f.read())
+    columns = {'key': list(data.keys())}
+    for field in fields:
+        columns[field] = [value.get(field, '') for value in data.values()]
+    table = pa.table(columns)
+    with pa.OSFile(arrow_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    print(f'{json_path} -> {arrow_path} ({table.num_rows} entries)')
+
+
+def main():
+    for json_path, fields in ((REGRESSIONS_JSON, _REGRESSION_FIELDS),
+                              (TEMPLATES_JSON, (_K_SWIFT, _K_FUZZIL))):
+        if os.path.exists(json_path):
+            convert(json_path, os.path.splitext(json_path)[0] + '.arrow', fields)
+
+
+if __name__ == '__main__':
+    main()
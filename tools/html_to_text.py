@@ -0,0 +1,75 @@
+"""Convert an HTML documentation tree into the plain-text corpus layout
+that index_to_rag_faiss indexes.
+
+Extraction runs on selectolax (the C lexbor engine) rather than the
+stdlib html.parser, which walks the markup character by character in
+Python bytecode and dominates wall time on large trees; files convert in
+parallel across cores.
+
+Usage: python -m tools.html_to_text <html_dir> <txt_dir>
+"""
+
+import concurrent.futures
+import os
+import re
+import sys
+from pathlib import Path
+
+from selectolax.parser import HTMLParser
+
+# Elements whose text is never documentation content.
+_STRIP_SELECTOR = 'script,style,noscript,svg,path'
+_WS = re.compile(r'\s+')
+
+
+def extract_text_from_html(content):
+    """Return the visible text of an HTML document, whitespace-collapsed."""
+    tree = HTMLParser(content)
+    for node in tree.css(_STRIP_SELECTOR):
+        node.decompose()
+    body = tree.body
+    # lexbor decodes entities during parsing; unescaping again here would
+    # corrupt documentation that literally shows entities (e.g. &amp;lt;).
+    text = body.text(separator=' ') if body is not None else ''
+    return _WS.sub(' ', text).strip()
+
+
+def _convert_one(job):
+    """Convert one file in a worker process; returns 1 if a .txt was
+    written."""
+    src, dst = job
+    try:
+        content = Path(src).read_text(encoding='utf-8', errors='replace')
+    except OSError:
+        return 0
+    text = extract_text_from_html(content)
+    if not text:
+        return 0
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    Path(dst).write_text(text, encoding='utf-8')
+    return 1
+
+
+def convert_html_to_txt(html_dir, txt_dir):
+    """Mirror every .html under html_dir as a .txt under txt_dir, keeping
+    the directory structure (and thus the topic names) intact."""
+    html_root = Path(html_dir)
+    jobs = [(str(src), str(Path(txt_dir) / src.relative_to(html_root).with_suffix('.txt')))
+            for src in sorted(html_root.rglob('*.html'))]
+    # Parsing is compute-bound inside lexbor, so processes scale with cores
+    # where threads would serialize on the GIL around the Python glue.
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=os.cpu_count()) as pool:
+        converted = sum(pool.map(_convert_one, jobs, chunksize=16))
+    print(f'{html_dir} -> {txt_dir} ({converted}/{len(jobs)} files)')
+
+
+def main():
+    if len(sys.argv) != 3:
+        print('Usage: python -m tools.html_to_text <html_dir> <txt_dir>')
+        sys.exit(1)
+    convert_html_to_txt(sys.argv[1], sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()
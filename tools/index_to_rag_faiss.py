@@ -0,0 +1,312 @@
+"""FAISS-backed knowledge bases for documentation and V8 source notes.
+
+create_vector_db embeds every text file under a directory with a
+SentenceTransformer model and persists a FAISS index plus a metadata
+sidecar; FAISSKnowledgeBase serves similarity queries over the persisted
+pair. This is a separate, heavier RAG path from the Chroma store in
+common_tools: corpora here are indexed offline in bulk and queried
+read-mostly.
+
+Usage: python -m tools.index_to_rag_faiss <corpus_dir> <index_dir>
+"""
+
+import concurrent.futures
+import functools
+import os
+import sys
+import threading
+from pathlib import Path
+
+import faiss
+import numpy as np
+import orjson
+from langchain_core.tools import tool
+from sentence_transformers import SentenceTransformer
+
+from tools.common_tools import RAG_DB_DIR
+
+_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
+
+# HNSW construction/search effort: 32 neighbors per node, a deeper beam
+# while building than while querying.
+_HNSW_M = 32
+_HNSW_EF_CONSTRUCTION = 200
+_HNSW_EF_SEARCH = 64
+
+
+def _read_one(path):
+    """Read one corpus file in a worker process."""
+    p = Path(path)
+    try:
+        return path, p.read_text(encoding='utf-8', errors='replace'), p.parent.name
+    except OSError:
+        return None
+
+
+def collect_text_files(root, suffixes=('.txt', '.md')):
+    """Return parallel (paths, contents, topics) lists for every matching
+    file under root. The topic is the containing directory's name.
+
+    The walk enumerates in the main process; the reads fan out to a
+    process pool, which overlaps the per-file I/O and decode across cores
+    for large documentation trees.
+    """
+    candidates = [str(path) for path in sorted(Path(root).rglob('*'))
+                  if path.suffix in suffixes and path.is_file()]
+    paths, contents, topics = [], [], []
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=os.cpu_count()) as pool:
+        for result in pool.map(_read_one, candidates, chunksize=32):
+            if result is None:
+                continue
+            path, content, topic = result
+            paths.append(path)
+            contents.append(content)
+            topics.append(topic)
+    return paths, contents, topics
+
+
+def create_vector_db(root, base_dir, model_name=_MODEL_NAME):
+    """Embed every text file under root and persist index + metadata into
+    base_dir."""
+    paths, contents, topics = collect_text_files(root)
+    if not contents:
+        raise ValueError(f'no text files under {root}')
+    model = SentenceTransformer(model_name)
+    # Length-sorted batching: the encoder pads every batch to its longest
+    # member, so grouping similar lengths cuts the wasted padding tokens.
+    # The inverse permutation restores corpus order afterwards.
+    order = np.argsort([len(content) for content in contents])
+    encoded = model.encode([contents[i] for i in order], batch_size=64,
+                           show_progress_bar=True,
+                           convert_to_numpy=True).astype('float32')
+    embeddings = np.empty_like(encoded)
+    embeddings[order] = encoded
+    # Inner product over L2-normalized vectors: search scores are cosine
+    # similarity directly, with no per-hit distance transform, and the IP
+    # kernel skips the squared-norm term the L2 one computes.
+    faiss.normalize_L2(embeddings)
+    # HNSW keeps query cost logarithmic as the corpus grows; an exact flat
+    # index re-scans all N vectors for every query.
+    index = faiss.IndexHNSWFlat(embeddings.shape[1], _HNSW_M,
+                                faiss.METRIC_INNER_PRODUCT)
+    index.hnsw.efConstruction = _HNSW_EF_CONSTRUCTION
+    index.add(embeddings)
+    os.makedirs(base_dir, exist_ok=True)
+    faiss.write_index(index, os.path.join(base_dir, 'index.faiss'))
+    documents = [{'path': path, 'topic': topic, 'content': content}
+                 for path, topic, content in zip(paths, topics, contents)]
+    with open(os.path.join(base_dir, 'metadata.json'), 'wb') as f:
+        f.write(orjson.dumps({'model': model_name, 'documents': documents}))
+    print(f'{root} -> {base_dir} ({len(documents)} documents)')
+
+
+class FAISSKnowledgeBase:
+    """Query-side wrapper around a persisted FAISS index and its metadata."""
+
+    def __init__(self, base_dir):
+        self.base_dir = base_dir
+        self.index = faiss.read_index(os.path.join(base_dir, 'index.faiss'))
+        if hasattr(self.index, 'hnsw'):
+            self.index.hnsw.efSearch = _HNSW_EF_SEARCH
+        with open(os.path.join(base_dir, 'metadata.json'), 'rb') as f:
+            meta = orjson.loads(f.read())
+        self.documents = meta['documents']
+        self.model = SentenceTransformer(meta.get('model', _MODEL_NAME))
+        # Per-query encoding dominates tool latency; ONNX Runtime cuts the
+        # transformer forward pass several-fold on CPU. Falls back to the
+        # SentenceTransformer (with all cores) when optimum is absent.
+        self._ort = self._build_ort_encoder(meta.get('model', _MODEL_NAME))
+        if self._ort is None:
+            try:
+                import torch
+                torch.set_num_threads(os.cpu_count() or 1)
+            except ImportError:
+                pass
+        # Repeated identical queries cost a dict hit instead of an SBERT
+        # forward pass plus an index search. Per-instance cache, guarded by
+        # a lock since tools may be called from several threads; writes
+        # invalidate via clear_cache().
+        self._lock = threading.RLock()
+        self._cached_search = functools.lru_cache(maxsize=1024)(self._search_impl)
+
+    def _build_ort_encoder(self, model_name):
+        try:
+            import onnxruntime
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+            from transformers import AutoTokenizer
+        except ImportError:
+            return None
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = os.cpu_count() or 1
+        onnx_dir = os.path.join(self.base_dir, 'onnx')
+        if os.path.isdir(onnx_dir):
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(
+                onnx_dir, provider='CPUExecutionProvider',
+                session_options=options)
+            tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+        else:
+            # One-time export; the artifact is cached beside the index.
+            ort_model = ORTModelForFeatureExtraction.from_pretrained(
+                model_name, export=True, provider='CPUExecutionProvider',
+                session_options=options)
+            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            ort_model.save_pretrained(onnx_dir)
+            tokenizer.save_pretrained(onnx_dir)
+        return ort_model, tokenizer
+
+    def _encode(self, query):
+        if self._ort is not None:
+            ort_model, tokenizer = self._ort
+            tokens = tokenizer([query], padding=True, truncation=True,
+                               return_tensors='np')
+            hidden = np.asarray(ort_model(**tokens).last_hidden_state)
+            # Mean-pool over real tokens, then L2-normalize — the same
+            # pipeline the SentenceTransformer applies, so query vectors
+            # stay compatible with the indexed document vectors.
+            mask = tokens['attention_mask'][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+            return (pooled / np.maximum(norms, 1e-12)).astype('float32')
+        return self.model.encode([query], convert_to_numpy=True).astype('float32')
+
+    def search(self, query, top_k=5, topic_filter=None):
+        with self._lock:
+            return self._cached_search(query, top_k, topic_filter)
+
+    def clear_cache(self):
+        with self._lock:
+            self._cached_search.cache_clear()
+
+    def _search_impl(self, query, top_k, topic_filter):
+        query_embedding = self._encode(query)
+        faiss.normalize_L2(query_embedding)
+        # Over-fetch when filtering so a narrow topic can still fill top_k.
+        fetch = top_k if topic_filter is None else top_k * 4
+        distances, indices = self.index.search(query_embedding, fetch)
+        # On an inner-product index over normalized vectors the score is
+        # already cosine similarity; pre-IP indexes built with L2 still get
+        # the old transform.
+        inner_product = self.index.metric_type == faiss.METRIC_INNER_PRODUCT
+        results = []
+        for distance, i in zip(distances[0], indices[0]):
+            if i < 0:
+                continue
+            doc = self.documents[i]
+            if doc.get('deleted'):
+                continue
+            if topic_filter and doc['topic'] != topic_filter:
+                continue
+            similarity = (float(distance) if inner_product
+                          else 1.0 / (1.0 + float(distance)))
+            results.append({'path': doc['path'], 'topic': doc['topic'],
+                            'content': doc['content'],
+                            'similarity': similarity})
+            if len(results) >= top_k:
+                break
+        # The cached value is shared between callers; a tuple discourages
+        # in-place edits.
+        return tuple(results)
+
+    def _save_metadata(self):
+        with open(os.path.join(self.base_dir, 'metadata.json'), 'wb') as f:
+            f.write(orjson.dumps({'model': _MODEL_NAME,
+                                  'documents': self.documents}))
+
+    def add_document(self, path, content, topic=''):
+        embedding = self.model.encode([content],
+                                      convert_to_numpy=True).astype('float32')
+        faiss.normalize_L2(embedding)
+        self.index.add(embedding)
+        self.documents.append({'path': path, 'topic': topic,
+                               'content': content})
+        faiss.write_index(self.index, os.path.join(self.base_dir, 'index.faiss'))
+        self._save_metadata()
+        self.clear_cache()
+
+    def remove_document(self, path):
+        # HNSW indexes cannot remove vectors; tombstone the metadata and
+        # filter at search time. A rebuild via create_vector_db compacts.
+        removed = False
+        for doc in self.documents:
+            if doc['path'] == path and not doc.get('deleted'):
+                doc['deleted'] = True
+                removed = True
+        if removed:
+            self._save_metadata()
+            self.clear_cache()
+        return removed
+
+
+class FAISSV8SourceRag(FAISSKnowledgeBase):
+    """Knowledge base over indexed V8 source notes and documentation."""
+
+    def __init__(self, base_dir=None):
+        super().__init__(base_dir or os.path.join(RAG_DB_DIR, 'v8_src_faiss'))
+
+
+_KNOWLEDGE_BASE = None
+_V8_RAG = None
+
+
+def _get_knowledge_base():
+    global _KNOWLEDGE_BASE
+    if _KNOWLEDGE_BASE is None:
+        _KNOWLEDGE_BASE = FAISSKnowledgeBase(os.path.join(RAG_DB_DIR, 'kb_faiss'))
+    return _KNOWLEDGE_BASE
+
+
+def _get_v8_rag():
+    global _V8_RAG
+    if _V8_RAG is None:
+        _V8_RAG = FAISSV8SourceRag()
+    return _V8_RAG
+
+
+def _render_results(results):
+    if not results:
+        return 'No results found'
+    return '\n'.join(
+        f'=== {r["path"]} [{r["topic"]}] (similarity {r["similarity"]:.3f})\n'
+        f'{r["content"]}' for r in results)
+
+
+@tool
+def search_knowledge_base(query: str, top_k: int = 5, topic: str = '') -> str:
+    """Search the indexed knowledge base; topic optionally restricts results to one topic directory."""
+    return _render_results(_get_knowledge_base().search(query, top_k,
+                                                        topic or None))
+
+
+@tool
+def search_v8_source_rag(query: str, top_k: int = 5) -> str:
+    """Search the indexed V8 source notes for the given query."""
+    return _render_results(_get_v8_rag().search(query, top_k))
+
+
+@tool
+def update_rag_db(path: str, content: str, topic: str = '') -> str:
+    """Add or replace a document in the knowledge base under the given path."""
+    kb = _get_knowledge_base()
+    kb.remove_document(path)
+    kb.add_document(path, content, topic)
+    return f'Updated {path}'
+
+
+@tool
+def delete_rag_db(path: str) -> str:
+    """Remove the document stored under the given path from the knowledge base."""
+    if _get_knowledge_base().remove_document(path):
+        return f'Deleted {path}'
+    return f'No document found for {path}'
+
+
+def main():
+    if len(sys.argv) != 3:
+        print(__doc__.strip().splitlines()[-1])
+        sys.exit(1)
+    create_vector_db(sys.argv[1], sys.argv[2])
+
+
+if __name__ == '__main__':
+    main()